@@ -1,11 +1,19 @@
+import os
 import time
 import requests
 import threading
-from firetracker import FireTracker
-from flask import Flask, request
-from twilio.twiml.messaging_response import MessagingResponse
+import multiprocessing
+from multiprocessing.connection import Connection
+from fire_feed import FireFeed, FireStore
+from reports import TrailReport, generate_reports
+from registry import default_registry
+from sms import TrailMatcher, parse_window, render_twiml
+from metrics import Metrics, profile_cycle
+from result_cache import ResultCache
+from flask import Flask, Response, request
 from datetime import datetime, timedelta
 from pytz import timezone
+from typing import *
 
 app = Flask(__name__)
 
@@ -13,77 +21,133 @@ LISTEN_ADDRESS = '209.94.59.175'
 LISTEN_PORT = 5000
 # LISTEN_ADDRESS = '0.0.0.0'
 # LISTEN_PORT = 8080
+REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', 0)) # more than 1 builds trail reports in a process pool
+REPORT_TIMEOUT = float(os.environ.get('REPORT_TIMEOUT', 15 * 60)) # seconds before a trail's report is abandoned for this cycle
+INCREMENTAL_SYNC = os.environ.get('INCREMENTAL_SYNC', '1') == '1' # only download fires edited since the last sync
+SEGMENT_LENGTH = int(os.environ.get('SEGMENT_LENGTH', 1600)) # characters per SMS; 160 for satellite messengers
+ISOLATE_REFRESH = os.environ.get('ISOLATE_REFRESH', '0') == '1' # compute reports in a separate process so the webhook never waits on the GIL
+RESULT_CACHE = os.environ.get('RESULT_CACHE') # SQLite file keeping per-fire results across restarts, in memory only if unset
+PROFILE_REFRESH = os.environ.get('PROFILE_REFRESH') # 'cprofile' or 'tracemalloc' to capture each refresh cycle in ./profiles
 
 
 err_text = 'Sorry, an error occurred while generating the fire report.\nPlease try again later.'
+registry = default_registry() # supported trails, from trails.json
+trail_codes = registry.codes()
+not_found_text = f"Sorry, we could not find a supported trail name in your message.\nPlease enter one of the following: {', '.join(trail_codes[:-1])}, or {trail_codes[-1]}\nMore trails are forthcoming!"
 
-fire_reports = {
-    'PCT': err_text,
-    'CT': err_text,
-    'PNT': err_text,
-    'AZT': err_text,
-    'CDT': err_text
-}
-
-trail_names = {
-    'PCT': 'PCT',
-    'Pacific Crest Trail': 'PCT',
-    'CT': 'CT',
-    'Colorado Trail': 'CT',
-    'PNT': 'PNT',
-    'Pacific Northwest Trail': 'PNT',
-    'AZT': 'AZT',
-    'Arizona Trail': 'AZT',
-    'CDT': 'CDT',
-    'Continental Divide Trail': 'CDT'
-}
-
-def call_api():
-    api_url = 'https://services3.arcgis.com/T4QMspbfLg3qTGWY/arcgis/rest/services/WFIGS_Interagency_Perimeters_Current/FeatureServer/0/query?where=1%3D1&outFields=*&returnGeometry=true&f=json'
+fire_reports = {trail: err_text for trail in trail_codes}
+trail_names = registry.trail_names()
+
+trail_matcher = TrailMatcher(trail_names)
+not_found_twiml = render_twiml(not_found_text, SEGMENT_LENGTH)
+twiml_reports = {trail: render_twiml(report, SEGMENT_LENGTH) for trail, report in fire_reports.items()} # replies, pre-rendered each refresh
+window_reports = {} # trail -> TrailReport, for replies to messages with a mile marker
+
+fire_store = FireStore()
+report_signatures = {} # trail -> versions of the fires its current report was built from
+result_cache = ResultCache(path=RESULT_CACHE)
+metrics = Metrics()
+
+def call_api() -> FireFeed:
     while True:
         try:
-            response = requests.get(api_url)
-            response.raise_for_status()
-            data = response.json()
-            return data['features']
+            changed = fire_store.sync(full=not INCREMENTAL_SYNC)
+            print(f'{len(changed)} fire(s) changed')
+            metrics.set('fire_fetch_seconds', fire_store.stats['seconds'], 'Duration of the last perimeter feed sync')
+            metrics.set('fire_fetch_bytes', fire_store.stats['bytes'], 'Bytes downloaded by the last feed sync')
+            metrics.set('fire_fetch_requests', fire_store.stats['requests'], 'Requests made by the last feed sync')
+            metrics.set('fire_parse_seconds', fire_store.stats['parse_seconds'], 'Time parsing new or edited perimeters in the last sync')
+            metrics.set('fire_changed_fires', len(changed), 'Fires added, edited or removed by the last sync')
+            with metrics.timer('fire_feed_build_seconds', 'Time building the shared fire feed and its STRtree'):
+                feed = fire_store.feed()
+            metrics.set('fire_feed_fires', len(feed), 'Fires in the local feed')
+            return feed
         except (requests.exceptions.RequestException, ValueError, KeyError) as e:
             print(f"Error retrieving data: {e}")
             print("Retrying in 1 hour...")
             time.sleep(60 * 60)
 
-def retrieve_reports():
+# Swap in a refresh cycle's reports and their TwiML as a whole so a reply never mixes two cycles
+def publish_reports(reports: dict, twiml: dict, windows: dict, metrics_snapshot: Tuple[dict, dict]) -> None:
+    global fire_reports, twiml_reports, window_reports
+    fire_reports, twiml_reports, window_reports = reports, twiml, windows
+    metrics.replace(metrics_snapshot)
+
+def record_report(trail: str, report: TrailReport) -> None:
+    for stage, seconds in report.stats.get('timings', {}).items():
+        metrics.set('fire_stage_seconds', seconds, 'Time spent in each FireTracker stage for the last report', trail=trail, stage=stage)
+    metrics.set('fire_close_fires', report.stats.get('close_fires', 0), 'Fires within 50 miles of the trail', trail=trail)
+    metrics.set('fire_crossing_fires', report.stats.get('fires_crossing_trail', 0), 'Fires crossing the trail', trail=trail)
+    metrics.set('fire_cached_fires', report.stats.get('cached_fires', 0), 'Close fires whose geometry results were reused from an earlier cycle', trail=trail)
+    metrics.set('fire_report_chars', report.stats.get('report_chars', 0), 'Length of the trail report', trail=trail)
+
+# One refresh cycle: sync the feed and rebuild the reports of trails whose nearby fires changed
+def refresh(current_reports: dict, current_windows: dict) -> Tuple[dict, dict]:
+    fire_store.set_spatial_filter(registry.envelopes(list(current_reports.keys())))
+    feed = call_api() # every fire is parsed once and matched against all trail buffers in one query
+    with metrics.timer('fire_match_seconds', 'Time matching fires to every trail buffer'):
+        registry.match(feed, list(current_reports.keys())) # only trails with a fire near their buffer are loaded
+    signatures = {trail: feed.signature(trail) for trail in current_reports.keys()}
+    trails = [trail for trail in current_reports.keys() if signatures[trail] != report_signatures.get(trail)]
+    reports = dict(current_reports)
+    windows = dict(current_windows)
+    for trail in current_reports.keys():
+        metrics.set('fire_candidates', len(feed.candidates[trail]), 'Fires intersecting the trail buffer', trail=trail)
+        metrics.set('fire_report_rebuilt', trail in trails, 'Whether the last refresh rebuilt the trail report', trail=trail)
+    for trail, report in generate_reports(feed, trails, workers=REPORT_WORKERS, timeout=REPORT_TIMEOUT, cache=result_cache).items():
+        if report is not None:
+            reports[trail] = report.text
+            windows[trail] = report
+            report_signatures[trail] = signatures[trail]
+            record_report(trail, report)
+            print(f'{trail} generated')
+        else:
+            reports[trail] = err_text
+            windows.pop(trail, None)
+            report_signatures.pop(trail, None)
+    return reports, windows
+
+def retrieve_reports(publish=publish_reports):
+    reports = dict(fire_reports)
+    windows = dict(window_reports)
     while True:
-        current_fires = call_api()
-        for trail in fire_reports.keys():
-            tracker = FireTracker(trail, current_fires)
-            success = tracker.create_SMS()
-            if success:
-                fire_reports[trail] = tracker.text
-                print(f'{trail} generated')
-            else:
-                fire_reports[trail] = err_text
-            del tracker
+        with profile_cycle(PROFILE_REFRESH, metrics), metrics.timer('fire_refresh_seconds', 'Duration of the last refresh cycle'):
+            reports, windows = refresh(reports, windows)
+        metrics.set('fire_refresh_timestamp_seconds', time.time(), 'Unix time the last refresh cycle finished')
+        publish(reports, {trail: render_twiml(report, SEGMENT_LENGTH) for trail, report in reports.items()}, windows, metrics.snapshot())
         time.sleep(60 * 60) # wait one hour before retrieving new reports
 
 @app.route('/test', methods=['GET'])
 def test():
     return 'testing'
 
+@app.route('/metrics', methods=['GET'])
+def metrics_reply():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/sms', methods=['POST'])
 def sms_reply():
-    resp = MessagingResponse()
     message = request.form.get('Body', '').strip()
-    match = False
-    for name in trail_names.keys():
-        if name.lower() in message.lower():
-            match = trail_names[name]
-            break
-    if match:
-        resp.message(fire_reports[match])
-    else:
-        resp.message('Sorry, we could not find a supported trail name in your message.\nPlease enter one of the following: PCT, CT, AZT, PNT, or CDT\nMore trails are forthcoming!')
-    return str(resp)
-
-ongoing_thread = threading.Thread(target=retrieve_reports)
+    match = trail_matcher.match(message)
+    if not match: return not_found_twiml
+    window = parse_window(message)
+    if window and match in window_reports:
+        return render_twiml(window_reports[match].window(*window), SEGMENT_LENGTH)
+    return twiml_reports[match]
+
+# Runs in the refresh process when ISOLATE_REFRESH is set, sending each cycle's reports to the web process
+def refresh_process(connection: Connection) -> None:
+    retrieve_reports(publish=lambda *published: connection.send(published))
+
+def receive_reports(connection: Connection) -> None:
+    while True:
+        publish_reports(*connection.recv())
+
+if ISOLATE_REFRESH:
+    receiver, sender = multiprocessing.get_context('fork').Pipe(duplex=False)
+    multiprocessing.get_context('fork').Process(target=refresh_process, args=(sender,)).start()
+    ongoing_thread = threading.Thread(target=receive_reports, args=(receiver,))
+else:
+    ongoing_thread = threading.Thread(target=retrieve_reports)
 ongoing_thread.start()
 app.run(host=LISTEN_ADDRESS, port=LISTEN_PORT, threaded=True, debug=False)
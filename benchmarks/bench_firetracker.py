@@ -0,0 +1,137 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import statistics
+import subprocess
+from typing import *
+
+app_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, app_dir)
+
+import trail_assets
+from firetracker import FireTracker
+from registry import default_registry
+from fire_feed import FireFeed
+from synthetic_feed import generate_feed, write_synthetic_trails
+
+# Times each FireTracker stage per trail against a synthetic fire season and writes the results as JSON,
+# e.g. python benchmarks/bench_firetracker.py --synthetic-trails --fires 1000 --compare benchmarks/results/abc1234.json
+
+def commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=app_dir, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+# Each stage reruns one step of FireTracker.__init__ or create_SMS on an already built tracker. The geometry
+# stages run on copies of the close fires without the results they compute, so every repeat does the work again;
+# 'cached_results' reruns them on the tracker's own fires, whose results are already known.
+def stages(tracker: FireTracker, feed: FireFeed) -> Dict[str, Callable[[], object]]:
+    def uncached(*keep: str) -> List[object]:
+        return [dict(fire, result={key: fire['result'][key] for key in ('states',) + keep}) for fire in tracker.close_fires]
+
+    def close_fires() -> object:
+        feed.candidates.pop(tracker.trail, None)
+        return tracker.get_close_fires(tracker.trail_buffer, feed)
+
+    def mile_markers() -> object:
+        return tracker.approx_mile_marker([point['trail_coord'] for point in tracker.closest_points])
+
+    def cached_results() -> object:
+        return tracker.get_fires_crossing_trail(tracker.trail_linestring, tracker.close_fires), tracker.get_closest_points(tracker.trail_linestring, tracker.close_fires)
+
+    def create_sms() -> object:
+        tracker.text = ''
+        return tracker.create_SMS()
+
+    return {
+        'get_close_fires': close_fires,
+        'get_fires_crossing_trail': lambda: tracker.get_fires_crossing_trail(tracker.trail_linestring, uncached()),
+        'get_closest_points': lambda: tracker.get_closest_points(tracker.trail_linestring, uncached('crossing')),
+        'mile_marker_lookup': mile_markers,
+        'cached_results': cached_results,
+        'create_SMS': create_sms
+    }
+
+def measure(function: Callable[[], object], repeat: int) -> dict:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'median_s': statistics.median(times), 'min_s': min(times), 'peak_bytes': peak}
+
+def run(args: argparse.Namespace) -> dict:
+    payload = generate_feed(args.fires, args.vertices, large_fraction=args.large_fraction, large_vertices=args.large_vertices, seed=args.seed)
+    results = {'feed': {'parse': measure(lambda: FireFeed(payload['features']), args.repeat), 'bytes': len(json.dumps(payload))}}
+    feed = FireFeed(payload['features'])
+    for trail in args.trails:
+        start = time.perf_counter()
+        tracker = FireTracker(trail, feed)
+        construct = time.perf_counter() - start
+        results[trail] = {name: measure(stage, args.repeat) for name, stage in stages(tracker, feed).items()}
+        results[trail]['construct_s'] = construct
+        results[trail]['close_fires'] = len(tracker.close_fires)
+        results[trail]['fires_crossing_trail'] = len(tracker.fires_crossing_trail)
+        results[trail]['report_chars'] = len(tracker.text)
+        print(f"{trail}: {len(tracker.close_fires)} close, {len(tracker.fires_crossing_trail)} crossing, " + ', '.join(f"{name} {results[trail][name]['median_s'] * 1000:.1f} ms" for name in stages(tracker, feed)))
+    return results
+
+# Print the ratio of each stage's median time to an earlier results file
+def compare(results: dict, previous: dict) -> None:
+    for trail, trail_results in results.items():
+        for name, stage in trail_results.items():
+            if not isinstance(stage, dict) or 'median_s' not in stage: continue
+            before = previous.get('results', {}).get(trail, {}).get(name, {}).get('median_s')
+            if before:
+                print(f"{trail} {name}: {before * 1000:.1f} ms -> {stage['median_s'] * 1000:.1f} ms ({stage['median_s'] / before:.2f}x)")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark FireTracker stages on a synthetic NIFC feed')
+    parser.add_argument('--trails', nargs='+', default=default_registry().codes())
+    parser.add_argument('--fires', type=int, default=500)
+    parser.add_argument('--vertices', type=int, default=2000, help='vertices per fire perimeter')
+    parser.add_argument('--large-fraction', type=float, default=0.05, help='share of fires with --large-vertices')
+    parser.add_argument('--large-vertices', type=int, default=12000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--synthetic-trails', action='store_true', help='generate stand-in trail and state files instead of reading ./trail_wkt_files')
+    parser.add_argument('--output', help='results file, default benchmarks/results/<commit>.json')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.synthetic_trails:
+            write_synthetic_trails(directory)
+            trail_assets.TRAIL_DIR = os.path.join(directory, 'trail_wkt_files')
+            trail_assets.STATE_DIR = os.path.join(directory, 'state_wkt_files')
+            trail_assets.CACHE_DIR = os.path.join(directory, 'trail_cache')
+        results = run(args)
+
+    output = args.output or os.path.join(app_dir, 'benchmarks', 'results', f'{commit()}.json')
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as results_file:
+        json.dump({
+            'commit': commit(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'params': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+            'results': results
+        }, results_file, indent=2)
+    print(f'Results written to {output}')
+    if args.compare:
+        with open(args.compare, 'r') as previous_file:
+            compare(results, json.load(previous_file))
+
+if __name__ == '__main__':
+    main()
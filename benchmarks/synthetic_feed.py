@@ -0,0 +1,106 @@
+import os
+import numpy as np
+import shapely
+from typing import *
+from shapely.geometry import LineString, Polygon, box
+
+# Rough (lon, lat) routes and state bounding boxes, densified into stand-ins for the real WKT files
+# so the benchmarks can run on a machine without the trail data
+SYNTHETIC_TRAILS = {
+    'CT': [(-105.1, 39.6), (-105.9, 39.3), (-106.5, 38.5), (-107.5, 37.8), (-107.9, 37.3)],
+    'PNT': [(-114.0, 48.99), (-116.5, 48.8), (-119.0, 48.6), (-121.5, 48.7), (-124.7, 48.2)],
+    'AZT': [(-111.1, 31.33), (-110.8, 32.4), (-111.5, 33.5), (-111.7, 35.2), (-112.1, 36.99)],
+    'PCT': [(-116.5, 32.6), (-118.2, 35.5), (-119.4, 37.8), (-121.3, 40.6), (-121.7, 43.0), (-121.8, 45.7), (-121.3, 47.4), (-120.8, 49.0)],
+    'CDT': [(-108.2, 31.5), (-108.1, 33.5), (-106.5, 36.3), (-106.8, 37.7), (-106.0, 39.5), (-107.5, 41.6), (-110.3, 43.5), (-113.0, 45.7), (-114.0, 48.99)]
+}
+SYNTHETIC_STATES = {
+    'Colorado': (-109.05, 37, -102.05, 41),
+    'New Mexico': (-109.05, 31.33, -103, 37),
+    'California': (-124.4, 32.5, -120, 42),
+    'Nevada': (-120, 35, -114, 42),
+    'Oregon': (-124.6, 42, -116.5, 46.2),
+    'Washington': (-124.8, 46.2, -117, 49),
+    'Arizona': (-114.8, 31.33, -109.05, 37),
+    'Utah': (-114.05, 37, -109.05, 42),
+    'Wyoming': (-111.05, 41, -104.05, 45),
+    'Idaho': (-117.2, 42, -111.05, 49),
+    'Montana': (-116.05, 45, -104.04, 49)
+}
+BUFFER_DEGREES = 0.72 # roughly 50 miles
+
+def swap(geometry: object) -> object:
+    return shapely.transform(geometry, lambda coords: coords[:, ::-1])
+
+# Write trail, buffer and state WKT files in the layout FireTracker reads
+def write_synthetic_trails(directory: str, spacing: float = 0.005, seed: int = 0) -> None:
+    rng = np.random.default_rng(seed)
+    os.makedirs(os.path.join(directory, 'trail_wkt_files'), exist_ok=True)
+    os.makedirs(os.path.join(directory, 'state_wkt_files'), exist_ok=True)
+    for trail, route in SYNTHETIC_TRAILS.items():
+        coords = shapely.get_coordinates(shapely.segmentize(LineString(route), spacing))
+        coords[1:-1] += rng.normal(0, spacing / 4, (len(coords) - 2, 2))
+        linestring = LineString(coords)
+        with open(os.path.join(directory, 'trail_wkt_files', f'{trail}.wkt'), 'w') as wkt_file:
+            wkt_file.write(swap(linestring).wkt)
+        with open(os.path.join(directory, 'trail_wkt_files', f'{trail}_buffer.wkt'), 'w') as wkt_file:
+            wkt_file.write(swap(LineString(route).buffer(BUFFER_DEGREES)).wkt)
+    for state, bounds in SYNTHETIC_STATES.items():
+        with open(os.path.join(directory, 'state_wkt_files', f'{state.lower().replace(" ", "_")}.wkt'), 'w') as wkt_file:
+            wkt_file.write(shapely.segmentize(box(*bounds), 0.01).wkt)
+
+# Noisy closed ring around a center in ArcGIS order: (lon, lat), clockwise for outer rings
+def ring(rng: np.random.Generator, center: Tuple[float, float], radius: float, vertices: int, clockwise: bool = True) -> List[List[float]]:
+    angles = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+    if clockwise: angles = -angles
+    radii = radius * (1 + 0.25 * np.sin(angles * rng.integers(2, 7) + rng.uniform(0, 2 * np.pi))) * rng.uniform(0.9, 1.1, vertices)
+    lon = center[0] + radii * np.cos(angles) / np.cos(np.radians(center[1]))
+    lat = center[1] + radii * np.sin(angles)
+    coords = np.column_stack((lon, lat))
+    return np.vstack((coords, coords[:1])).round(6).tolist()
+
+# A WFIGS-style perimeter query response. Fires are placed on the trail (crossing), within the buffer,
+# on state borders (multi-state) or anywhere in the west; a share are multipolygons with a hole.
+def generate_feed(fires: int = 500, vertices: int = 2000, large_fraction: float = 0.05, large_vertices: int = 12000,
+                  multipolygon_fraction: float = 0.1, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    routes = [shapely.segmentize(LineString(route), 0.05) for route in SYNTHETIC_TRAILS.values()]
+    trail_points = np.vstack([shapely.get_coordinates(route) for route in routes])
+    borders = shapely.get_coordinates(shapely.segmentize(shapely.boundary(shapely.union_all([box(*bounds) for bounds in SYNTHETIC_STATES.values()])), 0.05))
+    features = []
+    for i in range(fires):
+        kind = rng.choice(['crossing', 'near', 'border', 'anywhere'], p=[0.2, 0.3, 0.1, 0.4])
+        if kind == 'crossing':
+            center = trail_points[rng.integers(len(trail_points))]
+            radius = rng.uniform(0.02, 0.15)
+        elif kind == 'near':
+            center = trail_points[rng.integers(len(trail_points))] + rng.uniform(-0.6, 0.6, 2)
+            radius = rng.uniform(0.01, 0.08)
+        elif kind == 'border':
+            center = borders[rng.integers(len(borders))]
+            radius = rng.uniform(0.02, 0.2)
+        else:
+            center = np.array([rng.uniform(-124, -103), rng.uniform(31.5, 49)])
+            radius = rng.uniform(0.005, 0.1)
+        n = large_vertices if rng.random() < large_fraction else vertices
+        rings = [ring(rng, tuple(center), radius, n)]
+        if rng.random() < multipolygon_fraction:
+            rings.append(ring(rng, tuple(center), radius * 0.3, max(n // 10, 8), clockwise=False)) # hole
+            rings.append(ring(rng, (center[0] + radius * 3, center[1]), radius * 0.5, max(n // 4, 8))) # spot fire
+        features.append({
+            'attributes': {
+                'OBJECTID': i + 1,
+                'poly_IncidentName': f'Synthetic {i + 1}',
+                'attr_FireDiscoveryDateTime': 1688169600000 + int(rng.integers(0, 60)) * 86400000,
+                'attr_IncidentSize': float(round(rng.uniform(1, 200000), 1)),
+                'attr_PercentContained': float(rng.integers(0, 101)),
+                'poly_DateCurrent': 1693526400000,
+                'attr_ModifiedOnDateTime_dt': 1693526400000
+            },
+            'geometry': {'rings': rings}
+        })
+    return {
+        'objectIdFieldName': 'OBJECTID',
+        'geometryType': 'esriGeometryPolygon',
+        'spatialReference': {'wkid': 4326},
+        'features': features
+    }
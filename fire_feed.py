@@ -0,0 +1,349 @@
+import time
+import array
+import hashlib
+import datetime
+import threading
+import requests
+import urllib3
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+import numpy as np
+import shapely
+from typing import *
+from shapely import STRtree
+from shapely.geometry import Polygon, MultiPolygon
+
+try:
+    import ijson # optional, for streaming the feature queries
+except ImportError:
+    ijson = None
+
+API_URL = 'https://services3.arcgis.com/T4QMspbfLg3qTGWY/arcgis/rest/services/WFIGS_Interagency_Perimeters_Current/FeatureServer/0/query'
+EDIT_FIELDS = ['poly_DateCurrent', 'attr_ModifiedOnDateTime_dt'] # perimeter and incident data dates, epoch ms
+EDIT_OVERLAP = 10 * 60 * 1000 # ms before the latest edit seen that the next sync asks from, for edits committed out of order
+FIRE_FIELDS = ['OBJECTID', 'poly_IncidentName', 'attr_FireDiscoveryDateTime', 'attr_IncidentSize', 'attr_PercentContained'] + EDIT_FIELDS
+MAX_ALLOWABLE_OFFSET = 0.0005 # degrees (~50 m); the server generalizes perimeters to this tolerance before sending them
+GEOMETRY_PRECISION = 5 # decimal places (~1 m) of the returned coordinates
+SCALAR_EVENTS = ('null', 'boolean', 'integer', 'double', 'number', 'string')
+
+# Twice the signed area of a closed (lon, lat) ring, negative when clockwise
+def ring_area(ring: np.ndarray) -> float:
+    x, y = ring[:, 0], ring[:, 1]
+    return float(np.dot(x[:-1], y[1:]) - np.dot(x[1:], y[:-1]))
+
+# A (lon, lat) ring closed on its first point, or None with fewer than 3 distinct points
+def close_ring(ring: Sequence[Sequence[float]]) -> Optional[np.ndarray]:
+    ring = np.asarray(ring, dtype=float).reshape(-1, 2)
+    if len(ring) and not np.array_equal(ring[0], ring[-1]):
+        ring = np.vstack((ring, ring[:1]))
+    if len(np.unique(ring, axis=0)) < 3: return None
+    return ring
+
+# Assemble ArcGIS rings into one valid (lat, lon) Polygon or MultiPolygon. Outer rings are clockwise
+# and holes counter-clockwise; each hole belongs to the smallest outer ring containing it.
+def assemble_rings(rings: Sequence[np.ndarray]) -> Union[Polygon, MultiPolygon]:
+    rings = [ring for ring in (close_ring(np.asarray(ring, dtype=float)[:, :2]) for ring in rings if len(ring)) if ring is not None]
+    if len(rings) == 0: return Polygon()
+    clockwise = np.array([ring_area(ring) < 0 for ring in rings])
+    if not clockwise.any(): clockwise[:] = True # unoriented rings, treat every ring as a separate outer ring
+    rings = [ring[:, ::-1] for ring in rings] # switch to (lat, lon)
+    outer = np.flatnonzero(clockwise)
+    holes = np.flatnonzero(~clockwise)
+    shells = [Polygon(rings[i]) for i in outer]
+    interiors = [[] for _ in outer]
+    if len(holes):
+        points = shapely.points(np.array([rings[i][0] for i in holes]))
+        hole_indices, shell_indices = STRtree(shells).query(points, predicate='within')
+        areas = shapely.area(shells)
+        containing = {}
+        for hole, shell in zip(hole_indices.tolist(), shell_indices.tolist()):
+            if hole not in containing or areas[shell] < areas[containing[hole]]:
+                containing[hole] = shell
+        for i, hole in enumerate(holes):
+            if i in containing:
+                interiors[containing[i]].append(rings[hole])
+            else:
+                shells.append(Polygon(rings[hole])) # a hole outside every outer ring is a misoriented burn area
+                interiors.append([])
+    polygons = [Polygon(shell.exterior, holes) for shell, holes in zip(shells, interiors)]
+    geometry = polygons[0] if len(polygons) == 1 else MultiPolygon(polygons)
+    geometry = shapely.make_valid(geometry)
+    if geometry.geom_type not in ('Polygon', 'MultiPolygon'): # drop the lines and points make_valid can leave from degenerate rings
+        parts = [part for part in shapely.get_parts(shapely.get_parts(geometry)) if part.geom_type == 'Polygon']
+        geometry = MultiPolygon(parts) if len(parts) != 1 else parts[0]
+    return geometry
+
+def parse_fire(fire: object) -> Union[Polygon, MultiPolygon]:
+    return assemble_rings(fire['geometry']['rings'])
+
+# Query response features parsed from a byte stream as it downloads, one at a time, so neither the document nor
+# nested coordinate lists are ever held in memory. Each ring becomes a float array view of one coordinate buffer
+# per feature. Top-level scalars such as exceededTransferLimit are stored in `response`; an error response raises.
+def stream_features(stream: BinaryIO, response: dict) -> Iterator[object]:
+    error = None
+    for prefix, event, value in ijson.parse(stream, use_float=True):
+        if prefix == 'features.item.geometry.rings.item.item.item':
+            values.append(value)
+        elif prefix == 'features.item.geometry.rings.item.item':
+            if event == 'end_array': points += 1
+        elif prefix == 'features.item.geometry.rings.item':
+            if event == 'end_array': ring_ends.append(points)
+        elif prefix.startswith('features.item.attributes.'):
+            attributes[prefix[len('features.item.attributes.'):]] = value
+        elif prefix == 'features.item':
+            if event == 'start_map':
+                attributes, values, points, ring_ends = {}, array.array('d'), 0, []
+            elif event == 'end_map':
+                coords = np.frombuffer(values, dtype=float).reshape(points, -1)[:, :2] if points else np.empty((0, 2))
+                yield {'attributes': attributes, 'geometry': {'rings': np.split(coords, ring_ends[:-1]) if ring_ends else []}}
+        elif prefix == 'error':
+            if event == 'start_map': error = {}
+            elif event == 'end_map': raise ValueError(error)
+        elif event not in SCALAR_EVENTS:
+            continue
+        elif prefix.startswith('error.') and error is not None and '.' not in prefix[len('error.'):]:
+            error[prefix[len('error.'):]] = value
+        elif '.' not in prefix:
+            response[prefix] = value
+
+# Compare geometries of features parsed by json or stream_features
+def same_geometry(geometry: Optional[dict], other: Optional[dict]) -> bool:
+    rings = (geometry or {}).get('rings') or []
+    other_rings = (other or {}).get('rings') or []
+    return len(rings) == len(other_rings) and all(np.array_equal(ring, other_ring) for ring, other_ring in zip(rings, other_rings))
+
+# Every attribute FireStore fetched for a fire, including the layer's edit date when it tracks edits. The data
+# dates alone stay the same through edits to acres or containment, or a late correction of the perimeter.
+def fire_version(fire: object) -> Tuple:
+    return tuple(sorted(fire['attributes'].items()))
+
+# Fire perimeters from one NIFC response, parsed once and shared by every trail
+class FireFeed():
+    def __init__(self, current_fires: List[object], shapes: Optional[np.ndarray] = None) -> None:
+        self.fires = current_fires
+        if shapes is None:
+            shapes = np.empty(len(current_fires), dtype=object)
+            shapes[:] = [parse_fire(fire) for fire in current_fires]
+        self.shapes = shapes
+        self.shapes.flags.writeable = False
+        self.tree = STRtree(self.shapes)
+        self.candidates = {} # trail -> indices of fires intersecting its buffer
+
+    # Rebuild a feed from to_wkb() output, e.g. in a worker process
+    @classmethod
+    def from_wkb(cls, attributes: List[object], wkb: np.ndarray, candidates: Optional[Dict[str, np.ndarray]] = None) -> 'FireFeed':
+        feed = cls([{'attributes': fire_attributes} for fire_attributes in attributes], shapes=shapely.from_wkb(wkb))
+        feed.candidates.update(candidates or {})
+        return feed
+
+    # Compact form of the parsed feed: attributes, shapes as WKB and the trail candidates already matched
+    def to_wkb(self) -> Tuple[List[object], np.ndarray, Dict[str, np.ndarray]]:
+        return [fire['attributes'] for fire in self.fires], shapely.to_wkb(self.shapes), self.candidates
+
+    def __len__(self) -> int:
+        return len(self.fires)
+
+    # SHA-1 of each perimeter's WKB, which stays the same while a fire's geometry is unchanged
+    def digests(self, indices: np.ndarray) -> List[str]:
+        return [hashlib.sha1(wkb).hexdigest() for wkb in shapely.to_wkb(self.shapes[indices])]
+
+    # Query every trail buffer against the fire tree in one pass. With a trail's (outer, inner) buffer bounds
+    # the tree is queried with the coarse outer polygon and only fires between the two are tested against the buffer.
+    def match_trails(self, buffers: Dict[str, Polygon], bounds: Optional[Dict[str, Tuple[Polygon, Polygon]]] = None) -> Dict[str, np.ndarray]:
+        bounds = bounds or {}
+        trails = list(buffers.keys())
+        geometries = np.empty(len(trails), dtype=object)
+        geometries[:] = [bounds[trail][0] if trail in bounds else buffers[trail] for trail in trails]
+        trail_indices, fire_indices = self.tree.query(geometries, predicate='intersects')
+        for i, trail in enumerate(trails):
+            indices = np.sort(fire_indices[trail_indices == i])
+            if trail in bounds:
+                uncertain = indices[~shapely.intersects(bounds[trail][1], self.shapes[indices])]
+                indices = np.setdiff1d(indices, uncertain[~shapely.intersects(buffers[trail], self.shapes[uncertain])])
+            self.candidates[trail] = indices
+        return {trail: self.candidates[trail] for trail in trails}
+
+    # Indices of fires intersecting a trail's buffer
+    def close_fires(self, trail: str, buffer: Polygon, bounds: Optional[Tuple[Polygon, Polygon]] = None) -> np.ndarray:
+        if trail not in self.candidates:
+            self.match_trails({trail: buffer}, {trail: bounds} if bounds else None)
+        return self.candidates[trail]
+
+    # Versions and geometry digests of the fires near a trail, which only change when a report needs to be rebuilt
+    def signature(self, trail: str) -> Tuple:
+        indices = np.asarray(self.candidates.get(trail, []), dtype=int)
+        versions = [(digest, fire_version(self.fires[i])) for i, digest in zip(indices, self.digests(indices))]
+        return tuple(sorted(versions, key=repr))
+
+# Local copy of the perimeter layer keyed by object ID. Each sync only downloads the fields
+# FireTracker uses, for features edited since the previous sync, and drops deleted features.
+class FireStore():
+    def __init__(self, api_url: str = API_URL, timeout: float = 120, workers: int = 4, stream: bool = ijson is not None) -> None:
+        self.api_url = api_url
+        self.timeout = timeout
+        self.workers = workers # concurrent page requests
+        self.stream = stream # parse feature pages while they download, needs ijson
+        self.session = requests.Session()
+        self.session.mount(api_url.split('://')[0] + '://', HTTPAdapter(pool_connections=1, pool_maxsize=workers))
+        self.max_record_count = None # server page size, read from the layer on first query
+        self.edit_date_field = None # the layer's database edit time field, if it tracks edits
+        self.envelopes = [] # (xmin, ymin, xmax, ymax) spatial filters in lon/lat, or none to fetch the whole country
+        self.fires = {} # OBJECTID -> feature
+        self.shapes = {} # OBJECTID -> parsed perimeter
+        self.last_edit = None # latest edit_date_field value seen, epoch ms
+        self.stats = {'requests': 0, 'bytes': 0, 'seconds': 0.0, 'parse_seconds': 0.0} # traffic and parse time of the last sync
+        self.stats_lock = threading.Lock()
+
+    # Only fetch fires intersecting the bounding envelope of the trail buffers, or of each buffer separately
+    def set_spatial_filter(self, buffers: List[Polygon], combine: bool = True) -> None:
+        bounds = shapely.bounds(np.asarray(buffers, dtype=object)).reshape(-1, 4)[:, [1, 0, 3, 2]] # buffers are (lat, lon)
+        if combine and len(bounds):
+            bounds = np.concatenate((bounds[:, :2].min(axis=0), bounds[:, 2:].max(axis=0)))[None, :]
+        envelopes = [tuple(envelope) for envelope in bounds.tolist()]
+        if envelopes != self.envelopes:
+            self.envelopes = envelopes
+            self.last_edit = None # fires newly inside the filter have to be fetched regardless of edit time
+
+    def query(self, params: dict, url: Optional[str] = None) -> dict:
+        response = self.session.get(url or self.api_url, params={'f': 'json', **params}, timeout=self.timeout)
+        with self.stats_lock:
+            self.stats['requests'] += 1
+            self.stats['bytes'] += len(response.content)
+        response.raise_for_status()
+        data = response.json()
+        if 'error' in data: raise ValueError(data['error'])
+        return data
+
+    # Features of one query parsed by stream_features, and whether the server has more. Read and parse errors
+    # raise requests' RequestException and ValueError, like the json path.
+    def query_stream(self, params: dict) -> Tuple[List[object], bool]:
+        response_fields = {}
+        with self.session.get(self.api_url, params={'f': 'json', **params}, timeout=self.timeout, stream=True) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            try:
+                features = list(stream_features(response.raw, response_fields))
+            # reading response.raw skips requests' own wrapping of these, which callers retry on
+            except urllib3.exceptions.HTTPError as e: # connection dropped or timed out mid-page
+                raise requests.exceptions.ConnectionError(e) from e
+            except ijson.JSONError as e:
+                raise ValueError(f'Malformed feature page: {e}') from e
+            finally:
+                with self.stats_lock:
+                    self.stats['requests'] += 1
+                    self.stats['bytes'] += response.raw.tell()
+        return features, bool(response_fields.get('exceededTransferLimit'))
+
+    def spatial_params(self, envelope: Optional[Tuple[float]]) -> dict:
+        if envelope is None: return {}
+        return {
+            'geometry': ','.join(map(str, envelope)),
+            'geometryType': 'esriGeometryEnvelope',
+            'inSR': 4326,
+            'spatialRel': 'esriSpatialRelIntersects'
+        }
+
+    def query_ids(self) -> Set[int]:
+        object_ids = set()
+        for envelope in self.envelopes or [None]:
+            object_ids.update(self.query({'where': '1=1', 'returnIdsOnly': 'true', **self.spatial_params(envelope)})['objectIds'] or [])
+        return object_ids
+
+    # One page of features, following up if the server returns fewer than asked for
+    def query_page(self, params: dict, offset: int, count: int) -> List[object]:
+        features = []
+        while len(features) < count:
+            page_params = {**params, 'resultOffset': offset + len(features), 'resultRecordCount': count - len(features)}
+            if self.stream:
+                page, exceeded = self.query_stream(page_params)
+            else:
+                data = self.query(page_params)
+                page, exceeded = data['features'], data.get('exceededTransferLimit')
+            features += page
+            if not page or not exceeded: break
+        return features
+
+    # Page size and edit tracking from the layer's metadata, read once
+    def read_layer_info(self) -> None:
+        if self.max_record_count is not None: return
+        layer = self.query({}, url=self.api_url.rsplit('/query', 1)[0])
+        self.edit_date_field = (layer.get('editFieldsInfo') or {}).get('editDateField')
+        self.max_record_count = layer.get('maxRecordCount') or 1000
+
+    # All matching features, paged by the server's record limit and requested concurrently
+    def query_features(self, where: str) -> List[object]:
+        self.read_layer_info()
+        features = {}
+        for envelope in self.envelopes or [None]:
+            params = {
+                'where': where,
+                'outFields': ','.join(FIRE_FIELDS + ([self.edit_date_field] if self.edit_date_field else [])),
+                'returnGeometry': 'true',
+                'outSR': 4326,
+                'maxAllowableOffset': MAX_ALLOWABLE_OFFSET,
+                'geometryPrecision': GEOMETRY_PRECISION,
+                'orderByFields': 'OBJECTID',
+                **self.spatial_params(envelope)
+            }
+            count = self.query({**params, 'returnCountOnly': 'true'})['count']
+            offsets = range(0, count, self.max_record_count)
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for page in executor.map(lambda offset: self.query_page(params, offset, self.max_record_count), offsets):
+                    for feature in page:
+                        features[feature['attributes']['OBJECTID']] = feature # envelopes can overlap
+        return list(features.values())
+
+    # Features stored or edited in the layer since a database edit time. The fires' own dates can't be used,
+    # since a perimeter uploaded late can carry an earlier poly_DateCurrent than one already fetched.
+    def edited_since(self, last_edit: int) -> str:
+        timestamp = datetime.datetime.fromtimestamp(max(last_edit - EDIT_OVERLAP, 0) // 1000, datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        return f"{self.edit_date_field} >= TIMESTAMP '{timestamp}'"
+
+    # Bring the store up to date and return the object IDs that were added, edited or removed
+    def sync(self, full: bool = False) -> Set[int]:
+        self.stats = {'requests': 0, 'bytes': 0, 'seconds': 0.0, 'parse_seconds': 0.0}
+        start = time.perf_counter()
+        try:
+            return self.sync_changes(full)
+        finally:
+            self.stats['seconds'] = time.perf_counter() - start
+
+    def sync_changes(self, full: bool) -> Set[int]:
+        if full:
+            self.fires.clear()
+            self.shapes.clear()
+            self.last_edit = None
+        object_ids = self.query_ids()
+        changed = set(self.fires) - object_ids
+        for object_id in changed:
+            del self.fires[object_id]
+            del self.shapes[object_id]
+        self.read_layer_info()
+        # without edit tracking on the layer every sync downloads every feature, only reparsing changed ones
+        incremental = self.last_edit is not None and self.edit_date_field is not None
+        features = self.query_features(self.edited_since(self.last_edit) if incremental else '1=1')
+        missing = object_ids - set(self.fires) - {feature['attributes']['OBJECTID'] for feature in features}
+        if missing:
+            features += self.query_features(f"OBJECTID IN ({','.join(map(str, sorted(missing)))})")
+        for feature in features:
+            object_id = feature['attributes']['OBJECTID']
+            if object_id not in object_ids: continue
+            previous = self.fires.get(object_id)
+            reshaped = previous is None or not same_geometry(previous['geometry'], feature['geometry'])
+            if reshaped or previous['attributes'] != feature['attributes']:
+                self.fires[object_id] = feature
+                if reshaped:
+                    start = time.perf_counter()
+                    self.shapes[object_id] = parse_fire(feature)
+                    self.stats['parse_seconds'] += time.perf_counter() - start
+                changed.add(object_id)
+            edit = feature['attributes'].get(self.edit_date_field) if self.edit_date_field else None
+            if edit is not None: self.last_edit = max(edit, self.last_edit or 0)
+        return changed
+
+    # Current fires as a FireFeed, reusing the perimeters parsed in earlier syncs
+    def feed(self) -> FireFeed:
+        object_ids = sorted(self.fires)
+        shapes = np.empty(len(object_ids), dtype=object)
+        shapes[:] = [self.shapes[object_id] for object_id in object_ids]
+        return FireFeed([self.fires[object_id] for object_id in object_ids], shapes=shapes)
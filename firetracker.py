@@ -1,67 +1,58 @@
+import json
+import time
+import hashlib
 import datetime
 import traceback
 import fiona
-import matplotlib.pyplot as plt
 import geopandas as gpd
-import matplotlib.pyplot as plt
 import gpxpy
+import numpy as np
+import shapely
 from typing import *
-from shapely.geometry import LineString, Polygon, Point, MultiPolygon
-from shapely.wkt import loads
+from shapely.geometry import LineString, Polygon
 from math import radians, cos, sin, asin, sqrt
+from trail_assets import load_trail_assets
+from registry import TrailRegistry, default_registry
+from fire_feed import FireFeed
+from mile_index import MileIntervalIndex, merge_intervals
+from result_cache import ResultCache
+from render import render_fire_map
             
+CROSSING_MERGE_MILES = 0.5 # crossings of one fire closer than this along the trail are reported as one span
+
 class FireTracker():
-    def __init__(self, trail: str, current_fires: List[object]) -> None:
-        self.current_fires = current_fires
+    def __init__(self, trail: str, current_fires: Union[List[object], FireFeed], project_mile_markers: bool = False, cache: Optional[ResultCache] = None, registry: Optional[TrailRegistry] = None) -> None:
+        self.feed = current_fires if isinstance(current_fires, FireFeed) else FireFeed(current_fires)
+        self.current_fires = self.feed.fires
         self.text = ''
+        self.mile_index = None
+        self.timings = {} # seconds spent in each stage, for refresh metrics
         self.trail = trail
-        self.trail_list = { # 'states' includes states within 50 miles of trail
-            'CT': {
-                'name': 'Colorado Trail',
-                'states': ['Colorado', 'New Mexico'],
-            },
-            'PCT': {
-                'name': 'Pacific Crest Trail',
-                'states': ['California', 'Nevada', 'Oregon', 'Washington'],
-            },
-            'CDT': {
-                'name': 'Continental Divide Trail',
-                'states': ['Arizona', 'New Mexico', 'Colorado', 'Wyoming', 'Idaho', 'Montana'],
-            },
-            'PNT': {
-                'name': 'Pacific Northwest Trail',
-                'states': ['Montana', 'Idaho', 'Washington'],
-            },
-            'AZT': {
-                'name': 'Arizona Trail',
-                'states': ['Arizona', 'Utah'],
-            }
-        }
-        self.trail_linestring = self.get_trail_linestring()
-        self.trail_buffer = self.get_trail_buffer(self.trail_linestring)
-        self.trail_mile_markers = self.get_mile_markers(self.trail_linestring)
-        self.states = self.trail_list[trail]['states']
-        self.state_border_polygons = [self.get_border(state) for state in self.states]
-        self.close_fires = self.get_close_fires(self.trail_buffer, self.current_fires)
-        self.fires_crossing_trail = self.get_fires_crossing_trail(self.trail_linestring, self.close_fires)
-        self.closest_points = self.get_closest_points(self.trail_linestring, self.close_fires)
+        self.project_mile_markers = project_mile_markers # project onto trail segments instead of snapping to vertices
+        self.registry = registry or default_registry()
+        self.states = self.registry[trail].states
+        self.assets = self.timed('load_trail_assets', load_trail_assets, trail, self.states, self.registry[trail].path, self.registry[trail].buffer_path) # parsed once and kept across refresh cycles
+        self.trail_linestring = self.assets.linestring
+        self.trail_buffer = self.assets.buffer
+        self.trail_index = self.assets.index
+        self.trail_mile_markers = self.assets.mile_markers
+        self.state_border_polygons = self.assets.state_borders
+        self.cache = cache # per-fire results from earlier refresh cycles
+        self.results_version = hashlib.sha1(json.dumps([trail, self.assets.stamps, [border['stamps'] for border in self.state_border_polygons], CROSSING_MERGE_MILES]).encode()).hexdigest()[:12]
+        self.close_fires = self.timed('get_close_fires', self.get_close_fires, self.trail_buffer, self.feed)
+        self.fires_crossing_trail = self.timed('get_fires_crossing_trail', self.get_fires_crossing_trail, self.trail_linestring, self.close_fires)
+        self.closest_points = self.timed('get_closest_points', self.get_closest_points, self.trail_linestring, self.close_fires)
+        self.timed('store_results', self.store_results)
+
+    def timed(self, stage: str, function: Callable, *args: object) -> Any:
+        start = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            self.timings[stage] = self.timings.get(stage, 0) + time.perf_counter() - start
     
     def plot(self) -> None:
-        plt.clf()
-        for border in self.state_border_polygons:
-            x, y = border['border'].exterior.xy
-            plt.plot(x, y, color='grey')
-        y, x = self.trail_linestring.xy
-        plt.plot(x, y, color='green')
-        y, x = self.trail_buffer.exterior.xy
-        plt.plot(x, y, color='blue')
-        for fire in self.close_fires:
-            y, x = fire['shape'].exterior.xy
-            plt.fill(x, y, color='red')
-            centroid = fire['shape'].centroid
-            plt.text(centroid.y + 1, centroid.x, fire['attributes']['name'])
-        plt.axis('equal')
-        plt.savefig(f'fire_pngs/{self.trail}_fires.png')
+        render_fire_map(self.assets, self.close_fires, f'fire_pngs/{self.trail}_fires.png')
 
     def getdistance(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
         R = 3959.87433 # radius in miles
@@ -73,16 +64,9 @@ class FireTracker():
         c = 2 * asin(sqrt(a))
         return R * c
 
-    # Finds closest mile marker to an intersection of the trail and a fire perimeter
-    def approx_mile_marker(self, intersection: List[float], trail_coords: List[List[float]]) -> List[float]:
-        least_dist = float('inf')
-        closest_point = [0,0]
-        for trail_coord in trail_coords:
-            d = self.getdistance(intersection[0],intersection[1],trail_coord[0],trail_coord[1])
-            if d < least_dist:
-                least_dist = d
-                closest_point = trail_coord
-        return closest_point
+    # Finds closest mile marker to each intersection of the trail and a fire perimeter
+    def approx_mile_marker(self, points: List[List[float]]) -> np.ndarray:
+        return self.timed('approx_mile_marker', self.trail_index.mile_markers, points, self.project_mile_markers)
     
     # Used to reduce state with multiple borders (ex. California with islands) to just main state border
     def get_largest_polygon(self, multipolygon: List[Polygon]) -> Polygon:
@@ -96,178 +80,155 @@ class FireTracker():
                     largest_polygon = polygon
         return largest_polygon
 
-    # Retrieve state border data as a Shapely polygon
-    def get_border(self, state: str) -> object:
-        with open(f'./state_wkt_files/{state.lower().replace(" ", "_")}.wkt', 'r') as wkt_file:
-            wkt_string = wkt_file.read()
-        polygon = loads(wkt_string)
-        return {
-            'state': state,
-            'border': polygon
-        }
+    # (trail version, fire ID, geometry digest) of each fire, keying its results in the result cache
+    def result_keys(self, feed: FireFeed, indices: np.ndarray) -> List[str]:
+        return [f"{self.results_version}/{feed.fires[i]['attributes'].get('OBJECTID')}/{digest}" for i, digest in zip(indices, feed.digests(indices))]
 
-    # Convert trail data to Shapely linestring
-    def get_trail_linestring(self) -> LineString:
-        with open(f'./trail_wkt_files/{self.trail}.wkt', 'r') as wkt_file:
-            wkt_string = wkt_file.read()
-        linestring = loads(wkt_string)
-        return linestring
-
-    def get_trail_buffer(self, trail: LineString) -> Polygon:
-        with open(f'./trail_wkt_files/{self.trail}_buffer.wkt', 'r') as wkt_file:
-            wkt_string = wkt_file.read()
-        polygon = loads(wkt_string)
-        return polygon
-    
-    # Create mile markers for each point in CT in the format dictionary[coordinate pair] = mile marker
-    def get_mile_markers(self, trail: LineString) -> dict:
-        mile_markers = {}
-        distance = 0
-        coords = list(trail.coords)
-        for i in range(1, len(coords)):
-            current_distance = self.getdistance(coords[i-1][0],coords[i-1][1],coords[i][0],coords[i][1])
-            mile_markers[coords[i]] = distance + current_distance
-            distance += current_distance
-        return mile_markers
-
-    def is_in_state(self, fire: Polygon, border: Polygon) -> bool:
-        for coord in fire.exterior.coords:
-            p = Point(coord[1], coord[0])
-            if border.contains(p): return True
-        return False
-    
-    def get_close_fires(self, buffer: Polygon, current_fires: List[object]) -> List[object]:
+    def get_close_fires(self, buffer: Polygon, feed: FireFeed) -> List[object]:
         close_fires = []
-        for fire in current_fires:
-            fire_shape = Polygon(self.switch_xy(fire['geometry']['rings'][0]))
-            if fire_shape.overlaps(buffer) or fire_shape.intersects(buffer):
-                states = [] # catch case of multi-state fire
-                for state_border in self.state_border_polygons:
-                    if self.is_in_state(fire_shape, state_border['border']):
-                        states.append(state_border['state'])
-                if len(states) == 0: states = ['Non U.S.']
-                close_fires.append({
-                    'attributes': {
-                        'name': fire['attributes']['poly_IncidentName'],
-                        'date': datetime.datetime.fromtimestamp(fire['attributes']['attr_FireDiscoveryDateTime'] / 1000).strftime("%m/%d/%y"),
-                        'states': states,
-                        'acres': fire['attributes']['attr_IncidentSize'],
-                        'containment': fire['attributes']['attr_PercentContained']
-                    },
-                    'shape': fire_shape
-                })
+        indices = feed.close_fires(self.trail, buffer, self.assets.buffer_bounds if buffer is self.assets.buffer else None)
+        keys = self.result_keys(feed, indices) if self.cache is not None else [None] * len(indices)
+        cached = [self.cache.get(key) if key is not None else None for key in keys]
+        results = [dict(result or {}) for result in cached]
+        missing = [j for j, result in enumerate(results) if 'states' not in result]
+        fire_states = self.assets.state_index.attribute(feed.shapes[indices[missing]]) # catch case of multi-state fire
+        for j, states in zip(missing, fire_states):
+            results[j]['states'] = states if len(states) else ['Non U.S.']
+        for i, key, result, from_cache in zip(indices, keys, results, cached):
+            fire = feed.fires[i]
+            close_fires.append({
+                'attributes': {
+                    'name': fire['attributes']['poly_IncidentName'],
+                    'date': datetime.datetime.fromtimestamp(fire['attributes']['attr_FireDiscoveryDateTime'] / 1000).strftime("%m/%d/%y"),
+                    'states': result['states'],
+                    'acres': fire['attributes']['attr_IncidentSize'],
+                    'containment': fire['attributes']['attr_PercentContained']
+                },
+                'shape': feed.shapes[i],
+                'key': key,
+                'result': result, # geometry results, cached while the perimeter is unchanged
+                'cached': from_cache is not None
+            })
         return close_fires
 
-    def switch_xy(self, points: List[List[float]]) -> List[List[float]]:
-        for point in points:
-            temp = point[0]
-            point[0] = point[1]
-            point[1] = temp
-        return points
+    # Fire shapes as an array for shapely's vectorized predicates
+    def fire_shapes(self, fires: List[object]) -> np.ndarray:
+        shapes = np.empty(len(fires), dtype=object)
+        shapes[:] = [fire['shape'] for fire in fires]
+        return shapes
 
+    # Which fires intersect the trail. Only fires within the coarse level's tolerance of the
+    # coarse trail can, so the full-resolution trail is only tested against those.
+    def intersects_trail(self, trail: LineString, shapes: np.ndarray) -> np.ndarray:
+        level = self.assets.levels[0]
+        crossing = shapely.dwithin(level['linestring'], shapes, level['tolerance'] * (1 + 1e-9))
+        crossing[crossing] = shapely.intersects(trail, shapes[crossing])
+        return crossing
+
+    # Fires crossing the trail, each with every crossing as a (start, end) trail mile span. The ends of all
+    # intersection parts are projected onto the trail together and crossings close together are merged.
     def get_fires_crossing_trail(self, trail: LineString, fires: List[object]) -> List[object]:
+        unknown = [fire for fire in fires if 'crossing' not in fire.setdefault('result', {})]
+        shapes = self.fire_shapes(unknown)
+        crosses = self.intersects_trail(trail, shapes)
+        crossing = np.flatnonzero(crosses)
+        intersections = shapely.intersection(trail, shapes[crossing])
+        parts, part_owners = shapely.get_parts(intersections, return_index=True)
+        ends = np.concatenate((shapely.get_point(parts, 0), shapely.get_point(parts, -1)))
+        ends = np.where(shapely.is_missing(ends), np.concatenate((parts, parts)), ends) # a part that only touches the trail is a point
+        miles = self.trail_index.project(shapely.get_coordinates(ends)).reshape(2, -1)
+        owners, starts, stops = merge_intervals(part_owners, miles[0], miles[1], CROSSING_MERGE_MILES)
+        spans = np.split(np.column_stack((starts, stops)), np.searchsorted(owners, np.arange(1, len(crossing))))
+        for fire, fire_crosses in zip(unknown, crosses.tolist()):
+            fire['result']['crossing'] = fire_crosses
+        for i, intersection, fire_spans in zip(crossing, intersections, spans):
+            unknown[i]['result']['intersection'] = shapely.get_coordinates(intersection).tolist()
+            unknown[i]['result']['crossings'] = fire_spans.tolist()
         fires_crossing_trail = []
         for fire in fires:
-            if trail.intersects(fire['shape']):
-                intersection = trail.intersection(fire['shape'])
-                if intersection.geom_type == 'LineString':
-                    cross_points = list(intersection.coords) 
-                else: #MultiLineString
-                    cross_points = []
-                    for line in intersection.geoms:
-                        for coord in line.coords:
-                            cross_points.append(coord)
-                fire['intersection'] = cross_points
+            if fire['result']['crossing']:
+                fire['intersection'] = list(map(tuple, fire['result']['intersection']))
+                fire['crossings'] = list(map(tuple, fire['result']['crossings']))
                 fires_crossing_trail.append(fire)
         return fires_crossing_trail
-    
-    # Reduce list size if too big (for purposes of comparing all list points to find closest pairing)
-    def reduce_if_greater(self, arr: List, n: int) -> List:
-        if len(arr) <= n: return arr
-        low_res = []
-        for i in range(0, len(arr), len(arr) // n):
-            low_res.append(arr[i])
-            if len(low_res) == n:
-                break
-        return low_res
 
-    # Finds closest point in a fire to the trail if not crossing
-    def closest_point(self, trail_coords: List[List[float]], fire_coords: List[List[float]]) -> List[float]:
-        comparisons = []
-        for fire_coord in fire_coords:
-            for trail_coord in trail_coords:
-                d = self.getdistance(fire_coord[0],fire_coord[1],trail_coord[0],trail_coord[1])
-                comparisons.append({
-                    'distance': d,
-                    'fire_coord': fire_coord,
-                    'trail_coord': trail_coord
-                })
-        return sorted(comparisons, key=lambda x: x['distance'])[0]
-        
+    # Finds the closest point in each fire to the trail if not crossing
     def get_closest_points(self, trail: LineString, fires: List[object]) -> List[object]:
-        closest_points = []
-        trail_coords = list(trail.coords)
-        for fire in fires:
-            if not trail.intersects(fire['shape']):
-                fire_coords = list(fire['shape'].exterior.coords)
-                low_res_trail = self.reduce_if_greater(trail_coords, 2000)
-                low_res_fire = self.reduce_if_greater(fire_coords, 5000)
-                closest_point = self.closest_point(low_res_trail, low_res_fire)
-                closest_point['name'] = fire['attributes']['name']
-                closest_points.append(closest_point)
-        return closest_points
-        # closest_points = list of {
-        #     'name': fire['attributes']['name']
-        #     'distance': d,
-        #     'fire_coord': fire_coord,
-        #     'trail_coord': trail_coord
-        # } for each fire
-    
+        unknown = [fire for fire in fires if 'crossing' not in fire.setdefault('result', {})]
+        for fire, fire_crosses in zip(unknown, self.intersects_trail(trail, self.fire_shapes(unknown)).tolist()):
+            fire['result']['crossing'] = fire_crosses
+        fires = [fire for fire in fires if not fire['result']['crossing']]
+        unknown = [fire for fire in fires if 'distance' not in fire['result']]
+        distances, trail_coords, fire_coords = self.trail_index.closest_points(self.fire_shapes(unknown))
+        for fire, distance, fire_coord, trail_coord in zip(unknown, distances.tolist(), fire_coords.tolist(), trail_coords.tolist()):
+            fire['result'].update({'distance': distance, 'fire_coord': fire_coord, 'trail_coord': trail_coord})
+        return [{
+            'name': fire['attributes']['name'],
+            'fire': fire,
+            'distance': fire['result']['distance'],
+            'fire_coord': tuple(fire['result']['fire_coord']),
+            'trail_coord': tuple(fire['result']['trail_coord'])
+        } for fire in fires]
+
+    # Keep the results of fires that weren't already cached for the next refresh cycle
+    def store_results(self) -> None:
+        if self.cache is None: return
+        self.cache.put_many({fire['key']: fire['result'] for fire in self.close_fires if not fire['cached']})
+
     def text_add_close_fires(self) -> None:
         text = ''
         text += f"Total fires within 50 miles of the {self.trail}: {len(self.close_fires)}\n"
         for fire in self.close_fires:
             attributes = fire['attributes']
             states = attributes['states']
-            text += f"{attributes['name']} Fire ({states[0] if len(states) == 1 else ', '.join(states[:-1]) + ' and ' + states[-1]}, {attributes['date']})"
+            line = f"{attributes['name']} Fire ({states[0] if len(states) == 1 else ', '.join(states[:-1]) + ' and ' + states[-1]}, {attributes['date']})"
             area = attributes['acres']
             containment = attributes['containment']
-            if area or containment: text += ' - '
+            if area or containment: line += ' - '
             if area:
-                text += str(round(area)) + ' acres'
-                if containment: text += ', '
+                line += str(round(area)) + ' acres'
+                if containment: line += ', '
             if containment:
-                text += str(round(containment)) + '% contained'
-            text += '\n'
+                line += str(round(containment)) + '% contained'
+            fire['text'] = line + '\n'
+            text += fire['text']
         self.text += text
     
     def text_add_closest_points(self) -> None:
         text = ''
-        for point in self.closest_points:
-            mile_marker = self.trail_mile_markers[self.approx_mile_marker(point['trail_coord'],list(self.trail_mile_markers.keys()))]
-            text += f"The {point['name']} Fire is {round(point['distance'])} mi. from the {self.trail} at mile marker {round(mile_marker)}\n"
+        mile_markers = self.approx_mile_marker([point['trail_coord'] for point in self.closest_points])
+        for point, mile_marker in zip(self.closest_points, mile_markers):
+            point['fire']['mile_spans'] = [(float(mile_marker), float(mile_marker))]
+            point['fire']['location'] = f"The {point['name']} Fire is {round(point['distance'])} mi. from the {self.trail} at mile marker {round(mile_marker)}\n"
+            text += point['fire']['location']
         self.text += text
 
     def text_add_fires_crossing_trail(self) -> None:
         text = ''
         text += f'{len(self.fires_crossing_trail)} fire(s) currently cross the {self.trail}\n'
         for fire in self.fires_crossing_trail:
-            cross_points = fire['intersection']
-            start = cross_points[0]
-            end = cross_points[len(cross_points) - 1]
-            start_mile = self.trail_mile_markers[self.approx_mile_marker(start,list(self.trail_mile_markers.keys()))]
-            end_mile = self.trail_mile_markers[self.approx_mile_marker(end,list(self.trail_mile_markers.keys()))]
-            text += f"The {fire['attributes']['name']} Fire crosses the {self.trail} at mi. {round(start_mile)}"
-            if(abs(end_mile - start_mile) > 1):
-                text += f' to mi. {round(end_mile)}'
-            text += '\n'
+            spans = []
+            for start_mile, end_mile in fire['crossings']:
+                span = f'mi. {round(start_mile)}'
+                if(abs(end_mile - start_mile) > 1):
+                    span += f' to mi. {round(end_mile)}'
+                spans.append(span)
+            line = f"The {fire['attributes']['name']} Fire crosses the {self.trail} at {spans[0] if len(spans) == 1 else ', '.join(spans[:-1]) + ' and ' + spans[-1]}"
+            fire['mile_spans'] = fire['crossings']
+            fire['location'] = line + '\n'
+            text += fire['location']
         self.text += text
 
+    # Close fires indexed by the trail miles they cross or come closest to, for mile window replies
+    def get_mile_index(self) -> MileIntervalIndex:
+        return MileIntervalIndex([(*span, fire['text'] + fire['location']) for fire in self.close_fires for span in fire.get('mile_spans', [])])
+
     def create_SMS(self) -> bool:
         try:
-            self.text_add_close_fires()
-            self.text_add_closest_points()
-            self.text_add_fires_crossing_trail()
+            self.timed('text_add_close_fires', self.text_add_close_fires)
+            self.timed('text_add_closest_points', self.text_add_closest_points)
+            self.timed('text_add_fires_crossing_trail', self.text_add_fires_crossing_trail)
+            self.mile_index = self.timed('get_mile_index', self.get_mile_index)
             return True
         except Exception as e:
             print('SMS failed to generate')
@@ -0,0 +1,77 @@
+import os
+import time
+import cProfile
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from typing import *
+
+# Gauges describing the latest refresh cycle, rendered in the Prometheus text format for /metrics
+class Metrics():
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.values = {} # (name, sorted label pairs) -> value
+        self.help = {}
+
+    def set(self, name: str, value: float, help: str = '', **labels: object) -> None:
+        with self.lock:
+            self.values[(name, tuple(sorted((key, str(label)) for key, label in labels.items())))] = float(value)
+            if help: self.help[name] = help
+
+    @contextmanager
+    def timer(self, name: str, help: str = '', **labels: object) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.set(name, time.perf_counter() - start, help, **labels)
+
+    # Plain data copy, so a refresh running in another process can send its metrics to the web process
+    def snapshot(self) -> Tuple[dict, dict]:
+        with self.lock:
+            return dict(self.values), dict(self.help)
+
+    def replace(self, snapshot: Tuple[dict, dict]) -> None:
+        with self.lock:
+            self.values, self.help = dict(snapshot[0]), dict(snapshot[1])
+
+    def render(self) -> str:
+        values, help = self.snapshot()
+        lines = []
+        for name in sorted({name for name, _ in values}):
+            if name in help: lines.append(f'# HELP {name} {help[name]}')
+            lines.append(f'# TYPE {name} gauge')
+            for (metric, labels), value in sorted(values.items()):
+                if metric != name: continue
+                label_text = ','.join(f'{key}="{label}"' for key, label in labels)
+                lines.append(f'{name}{{{label_text}}} {value!r}' if labels else f'{name} {value!r}')
+        return '\n'.join(lines) + '\n'
+
+# Optionally profile one refresh cycle: 'cprofile' writes a .prof file for pstats/snakeviz,
+# 'tracemalloc' records the peak traced memory and writes the top allocation sites
+@contextmanager
+def profile_cycle(mode: Optional[str], metrics: Metrics, directory: str = './profiles') -> Iterator[None]:
+    if mode not in ('cprofile', 'tracemalloc'):
+        yield
+        return
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"refresh-{time.strftime('%Y%m%d-%H%M%S')}")
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(f'{path}.prof')
+    else:
+        tracemalloc.start(25)
+        try:
+            yield
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            metrics.set('fire_refresh_peak_bytes', peak, 'Peak traced memory during the last profiled refresh')
+            with open(f'{path}.tracemalloc.txt', 'w') as stats_file:
+                stats_file.write('\n'.join(str(stat) for stat in snapshot.statistics('lineno')[:50]) + '\n')
@@ -0,0 +1,65 @@
+import numpy as np
+from typing import *
+
+# Merge each owner's overlapping intervals, and those less than `tolerance` apart, in one pass over all owners.
+# Returns the merged (owners, starts, ends) ordered by owner and then start.
+def merge_intervals(owners: np.ndarray, starts: np.ndarray, ends: np.ndarray, tolerance: float = 0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    owners, starts, ends = np.asarray(owners), np.minimum(starts, ends), np.maximum(starts, ends)
+    if len(owners) == 0: return owners, starts, ends
+    order = np.lexsort((starts, owners))
+    owners, starts, ends = owners[order], starts[order], ends[order]
+    offset = owners * (ends.max() - starts.min() + tolerance + 1) # keeps each owner's running maximum apart
+    reach = np.maximum.accumulate(ends + offset) - offset # furthest end so far within the owner
+    first = np.ones(len(owners), dtype=bool)
+    first[1:] = (owners[1:] != owners[:-1]) | (starts[1:] > reach[:-1] + tolerance)
+    first = np.flatnonzero(first)
+    return owners[first], starts[first], np.maximum.reduceat(ends, first)
+
+# Static centered interval tree over trail miles. Each item covers the span of trail a fire
+# crosses or comes closest to, and a window query returns the overlapping items in O(log n + k).
+class MileIntervalIndex():
+    def __init__(self, intervals: List[Tuple[float, float, object]]) -> None:
+        self.size = len(intervals)
+        self.root = self.build([(min(start, end), max(start, end), item) for start, end, item in intervals])
+
+    def __len__(self) -> int:
+        return self.size
+
+    # node = (center, intervals containing center by start, same intervals by end descending, left, right)
+    def build(self, intervals: List[Tuple[float, float, object]]) -> Optional[Tuple]:
+        if not intervals: return None
+        points = sorted(point for start, end, _ in intervals for point in (start, end))
+        center = points[len(points) // 2]
+        left = [interval for interval in intervals if interval[1] < center]
+        right = [interval for interval in intervals if interval[0] > center]
+        here = [interval for interval in intervals if interval[0] <= center <= interval[1]]
+        return (
+            center,
+            sorted(here, key=lambda interval: interval[0]),
+            sorted(here, key=lambda interval: interval[1], reverse=True),
+            self.build(left),
+            self.build(right)
+        )
+
+    # Items whose interval overlaps [start, end], ordered by where they start on the trail
+    def query(self, start: float, end: float) -> List[object]:
+        found = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node is None: continue
+            center, by_start, by_end, left, right = node
+            if end < center:
+                for interval in by_start:
+                    if interval[0] > end: break
+                    found.append(interval)
+                stack.append(left)
+            elif start > center:
+                for interval in by_end:
+                    if interval[1] < start: break
+                    found.append(interval)
+                stack.append(right)
+            else:
+                found.extend(by_start)
+                stack.extend((left, right))
+        return [item for _, _, item in sorted(found, key=lambda interval: (interval[0], interval[1]))]
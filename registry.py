@@ -0,0 +1,114 @@
+import os
+import json
+import numpy as np
+import shapely
+from typing import *
+from shapely import STRtree
+import trail_assets
+from trail_assets import TrailAssets, load_trail_assets, load_buffer_bounds, source_stamp
+from fire_feed import FireFeed
+
+MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'trails.json') # next to the code, unlike the trail files it lists
+
+# One manifest entry. Files are relative to trail_assets.TRAIL_DIR; a trail without a buffer file gets a computed one.
+class Trail():
+    def __init__(self, code: str, name: str, states: List[str], file: Optional[str] = None, buffer: Optional[str] = None, aliases: Optional[List[str]] = None) -> None:
+        self.code = code
+        self.name = name
+        self.states = states # states within 50 miles of the trail
+        self.file = file or f'{code}.wkt'
+        self.buffer = buffer or f'{self.file.rsplit(".", 1)[0]}_buffer.wkt'
+        self.aliases = aliases or []
+
+    @property
+    def path(self) -> str:
+        return os.path.join(trail_assets.TRAIL_DIR, self.file)
+
+    @property
+    def buffer_path(self) -> str:
+        return os.path.join(trail_assets.TRAIL_DIR, self.buffer)
+
+    # Loaded the first time a fire comes near the trail, then kept and reused from the cache
+    @property
+    def assets(self) -> TrailAssets:
+        return load_trail_assets(self.code, self.states, self.path, self.buffer_path)
+
+    @property
+    def buffer_bounds(self) -> np.ndarray:
+        return load_buffer_bounds(self.code, self.path, self.buffer_path)
+
+    # Every name the trail can be asked for by in a message
+    @property
+    def names(self) -> List[str]:
+        return [self.code, self.name] + self.aliases
+
+# The supported trails, read from a manifest. Fires are matched to trails through one STRtree over the
+# bounding boxes of every trail buffer, so only trails with a fire nearby ever load their geometry.
+class TrailRegistry():
+    def __init__(self, trails: List[Trail], stamp: Optional[List[int]] = None) -> None:
+        self.trails = {trail.code: trail for trail in trails}
+        self.stamp = stamp
+        self.tree = None
+        self.tree_bounds = None
+
+    @classmethod
+    def from_manifest(cls, path: str = MANIFEST_PATH) -> 'TrailRegistry':
+        with open(path, 'r') as manifest_file:
+            manifest = json.load(manifest_file)
+        return cls([Trail(**trail) for trail in manifest['trails']], source_stamp(path))
+
+    def __getitem__(self, code: str) -> Trail:
+        return self.trails[code]
+
+    def __contains__(self, code: str) -> bool:
+        return code in self.trails
+
+    def __len__(self) -> int:
+        return len(self.trails)
+
+    def codes(self) -> List[str]:
+        return list(self.trails.keys())
+
+    # alias -> trail code, for TrailMatcher
+    def trail_names(self) -> Dict[str, str]:
+        return {name: trail.code for trail in self.trails.values() for name in trail.names}
+
+    # (min lat, min lon, max lat, max lon) of each trail buffer, and the tree over them, rebuilt when a bound changes
+    def bounds(self) -> np.ndarray:
+        bounds = np.array([trail.buffer_bounds for trail in self.trails.values()]).reshape(-1, 4)
+        if self.tree is None or not np.array_equal(bounds, self.tree_bounds):
+            self.tree = STRtree(shapely.box(bounds[:, 0], bounds[:, 1], bounds[:, 2], bounds[:, 3]))
+            self.tree_bounds = bounds
+        return bounds
+
+    # Envelopes of the given trails' buffers, for FireStore.set_spatial_filter
+    def envelopes(self, codes: Optional[List[str]] = None) -> List[object]:
+        bounds = self.bounds()
+        rows = [i for i, code in enumerate(self.trails) if codes is None or code in codes]
+        return list(shapely.box(bounds[rows, 0], bounds[rows, 1], bounds[rows, 2], bounds[rows, 3]))
+
+    # Match the feed's fires to trails. Each fire is checked against the trail envelopes it overlaps in the
+    # registry tree and only those trails load their buffers for the exact match; the rest get no candidates.
+    def match(self, feed: FireFeed, codes: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+        self.bounds()
+        codes = self.codes() if codes is None else codes
+        trail_indices = np.unique(self.tree.query(feed.shapes)[1]) if len(feed) else np.empty(0, dtype=int)
+        nearby = {self.codes()[i] for i in trail_indices}
+        buffers, bounds = {}, {}
+        for code in codes:
+            if code in nearby:
+                assets = self.trails[code].assets
+                buffers[code], bounds[code] = assets.buffer, assets.buffer_bounds
+            else:
+                feed.candidates[code] = np.empty(0, dtype=int)
+        feed.match_trails(buffers, bounds)
+        return {code: feed.candidates[code] for code in codes}
+
+_registry = None
+
+# The registry from MANIFEST_PATH, reloaded when the manifest changes
+def default_registry() -> TrailRegistry:
+    global _registry
+    if _registry is None or _registry.stamp != source_stamp(MANIFEST_PATH):
+        _registry = TrailRegistry.from_manifest(MANIFEST_PATH)
+    return _registry
@@ -0,0 +1,109 @@
+import io
+import threading
+import numpy as np
+import shapely
+from typing import *
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import PathCollection
+from matplotlib.path import Path
+from PIL import Image
+from shapely.geometry.polygon import orient
+from trail_assets import TrailAssets
+
+MAP_WIDTH = 1200 # pixels
+THUMBNAIL_WIDTH = 480
+MMS_MAX_BYTES = 500 * 1024 # under the smallest common carrier limit for a picture message
+DPI = 100
+
+# A trail's map with its state borders, trail and buffer pre-rendered once into a raster. Fires are drawn over
+# a copy of that raster on their own Figure, without pyplot, so maps for different trails can render at once.
+class TrailMap():
+    def __init__(self, assets: TrailAssets, width: int = MAP_WIDTH) -> None:
+        self.assets = assets
+        self.state_borders = list(assets.state_borders)
+        bounds = shapely.bounds(np.array([border['border'] for border in self.state_borders] + [swap(assets.buffer)], dtype=object))
+        west, south, east, north = bounds[:, 0].min(), bounds[:, 1].min(), bounds[:, 2].max(), bounds[:, 3].max()
+        margin = 0.02 * max(east - west, north - south)
+        self.extent = (west - margin, east + margin, south - margin, north + margin) # (lon, lon, lat, lat), equal degrees like plt.axis('equal')
+        self.size = (width, max(1, round(width * (self.extent[3] - self.extent[2]) / (self.extent[1] - self.extent[0]))))
+        self.pixel = (self.extent[1] - self.extent[0]) / width # degrees per pixel, used to simplify what is drawn
+        self.base = self.render_base()
+
+    def figure(self) -> Tuple[Figure, object]:
+        figure = Figure(figsize=(self.size[0] / DPI, self.size[1] / DPI), dpi=DPI)
+        FigureCanvasAgg(figure)
+        axes = figure.add_axes((0, 0, 1, 1))
+        axes.set_axis_off()
+        axes.set_xlim(self.extent[0], self.extent[1])
+        axes.set_ylim(self.extent[2], self.extent[3])
+        return figure, axes
+
+    def render_base(self) -> np.ndarray:
+        figure, axes = self.figure()
+        figure.patch.set_facecolor('white')
+        for border in self.state_borders: # state borders are (lon, lat)
+            for ring in shapely.get_rings(shapely.get_parts(shapely.simplify(border['border'], self.pixel))):
+                x, y = ring.xy
+                axes.plot(x, y, color='grey', linewidth=0.8)
+        level = self.assets.level(self.pixel) # simplified no further than a pixel
+        y, x = level['linestring'].xy
+        axes.plot(x, y, color='green', linewidth=1)
+        for polygon in shapely.get_parts(level['buffer']):
+            y, x = polygon.exterior.xy
+            axes.plot(x, y, color='blue', linewidth=0.8)
+        figure.canvas.draw()
+        return np.asarray(figure.canvas.buffer_rgba()).copy()
+
+    # Write the map with the fires over the base layer as PNG, to a path or a file object. Only the fires are
+    # drawn, on a transparent figure that is then alpha-composited onto the base raster.
+    def render(self, fires: List[object], output: Union[str, BinaryIO], labels: bool = True) -> None:
+        figure, axes = self.figure()
+        figure.patch.set_alpha(0)
+        shapes = shapely.simplify(np.array([fire['shape'] for fire in fires], dtype=object), self.pixel / 2)
+        axes.add_collection(PathCollection(polygon_paths(shapes), facecolor='red', edgecolor='darkred', linewidth=0.3))
+        if labels:
+            for fire in fires:
+                centroid = fire['shape'].centroid
+                axes.text(centroid.y + 1, centroid.x, fire['attributes']['name'], fontsize=7, clip_on=True)
+        figure.canvas.draw()
+        overlay = np.asarray(figure.canvas.buffer_rgba())
+        alpha = overlay[..., 3:] / 255
+        composite = (overlay[..., :3] * alpha + self.base[..., :3] * (1 - alpha)).astype(np.uint8)
+        Image.fromarray(composite).save(output, format='PNG')
+
+# Polygons (with holes) in (lat, lon) as matplotlib paths in (lon, lat). Holes wind against their exterior.
+def polygon_paths(shapes: Sequence[object]) -> List[Path]:
+    paths = []
+    for polygon in shapely.get_parts(np.asarray(shapes, dtype=object)):
+        if polygon.is_empty or polygon.geom_type != 'Polygon': continue
+        polygon = orient(polygon)
+        rings = [np.asarray(ring.coords)[:, ::-1] for ring in (polygon.exterior, *polygon.interiors)]
+        paths.append(Path.make_compound_path(*(Path(ring, closed=True) for ring in rings)))
+    return paths
+
+def swap(geometry: object) -> object:
+    return shapely.transform(geometry, lambda coords: coords[:, ::-1])
+
+_trail_maps = {}
+_trail_maps_lock = threading.Lock()
+
+# The trail's map, rebuilt when its assets are reloaded because a trail or state file changed
+def trail_map(assets: TrailAssets, width: int = MAP_WIDTH) -> TrailMap:
+    with _trail_maps_lock:
+        cached = _trail_maps.get((assets.trail, width))
+        borders = assets.state_borders
+        if cached is None or cached.assets is not assets or len(cached.state_borders) != len(borders) or any(a is not b for a, b in zip(cached.state_borders, borders)):
+            cached = _trail_maps[(assets.trail, width)] = TrailMap(assets, width)
+        return cached
+
+def render_fire_map(assets: TrailAssets, fires: List[object], output: Union[str, BinaryIO], width: int = MAP_WIDTH, labels: bool = True) -> None:
+    trail_map(assets, width).render(fires, output, labels)
+
+# A small unlabeled PNG for a picture message, narrowed until it fits in MMS_MAX_BYTES
+def render_thumbnail(assets: TrailAssets, fires: List[object], width: int = THUMBNAIL_WIDTH) -> bytes:
+    while True:
+        output = io.BytesIO()
+        render_fire_map(assets, fires, output, width, labels=False)
+        if output.tell() <= MMS_MAX_BYTES or width <= 120: return output.getvalue()
+        width = width * 3 // 4
@@ -0,0 +1,95 @@
+import copy
+import time
+import traceback
+import multiprocessing
+import numpy as np
+from typing import *
+from firetracker import FireTracker
+from fire_feed import FireFeed
+from mile_index import MileIntervalIndex
+from result_cache import ResultCache
+
+_worker_feed = None
+_worker_cache = None
+
+# A trail's SMS text and its fires indexed by trail mile, as sent from the refresh to the web process
+class TrailReport():
+    def __init__(self, trail: str, text: str, mile_index: MileIntervalIndex, stats: Optional[dict] = None) -> None:
+        self.trail = trail
+        self.text = text
+        self.mile_index = mile_index
+        self.stats = stats or {} # stage timings and fire counts for the refresh metrics
+
+    # Fires within `miles` trail miles of a mile marker, answered from the index without any geometry
+    def window(self, mile: float, miles: float = 100) -> str:
+        fires = list(dict.fromkeys(self.mile_index.query(mile - miles, mile + miles))) # a fire crossing the window more than once is listed once
+        return f'{len(fires)} fire(s) within {round(miles)} trail miles of {self.trail} mile {round(mile)}\n' + ''.join(fires)
+
+# Runs once per worker process so the fire geometries are sent as WKB once per worker instead of once per task
+def init_worker(attributes: List[object], wkb: np.ndarray, candidates: Dict[str, np.ndarray], cache: Optional[ResultCache] = None) -> None:
+    global _worker_feed, _worker_cache
+    _worker_feed = FireFeed.from_wkb(attributes, wkb, candidates)
+    _worker_cache = copy.copy(cache) # without a forked SQLite connection; shares results with the refresh process through its file if it has one
+
+# The report FireTracker writes for a trail without any fires within 50 miles, built without loading the trail
+def empty_report(trail: str) -> TrailReport:
+    text = f'Total fires within 50 miles of the {trail}: 0\n0 fire(s) currently cross the {trail}\n'
+    return TrailReport(trail, text, MileIntervalIndex([]), {'timings': {}, 'close_fires': 0, 'fires_crossing_trail': 0, 'cached_fires': 0, 'report_chars': len(text)})
+
+# Build one trail's report, or None if it could not be generated, adding its new per-fire results to `results` if given
+def generate_report(trail: str, feed: Optional[FireFeed] = None, cache: Optional[ResultCache] = None, results: Optional[dict] = None) -> Optional[TrailReport]:
+    try:
+        if feed is None: feed, cache = _worker_feed, _worker_cache
+        if trail in feed.candidates and not len(feed.candidates[trail]): return empty_report(trail) # no fire near the trail's buffer
+        tracker = FireTracker(trail, feed, cache=cache)
+        if not tracker.create_SMS(): return None
+        if results is not None and cache is not None:
+            results.update({fire['key']: fire['result'] for fire in tracker.close_fires if not fire['cached']})
+        return TrailReport(trail, tracker.text, tracker.mile_index, {
+            'timings': tracker.timings,
+            'close_fires': len(tracker.close_fires),
+            'fires_crossing_trail': len(tracker.fires_crossing_trail),
+            'cached_fires': sum(fire['cached'] for fire in tracker.close_fires),
+            'report_chars': len(tracker.text)
+        })
+    except Exception as e:
+        print(f'{trail} report failed to generate')
+        traceback.print_exception(type(e), e, e.__traceback__)
+        return None
+
+# Runs in a worker: a trail's report and the new per-fire results, which are sent back for the refresh
+# process's cache when there is no SQLite file for the worker to write them to
+def generate_worker_report(trail: str) -> Tuple[Optional[TrailReport], Dict[str, dict]]:
+    results = {}
+    report = generate_report(trail, results=results)
+    return report, results if _worker_cache is not None and _worker_cache.path is None else {}
+
+# Build the reports for every trail, serially or across a process pool. A trail that fails
+# or is still running when the timeout expires gets None without holding up the others.
+def generate_reports(feed: FireFeed, trails: List[str], workers: int = 0, timeout: Optional[float] = None, cache: Optional[ResultCache] = None) -> Dict[str, Optional[TrailReport]]:
+    if workers <= 1 or len(trails) <= 1:
+        return {trail: generate_report(trail, feed, cache) for trail in trails}
+    reports = {}
+    timed_out = False
+    pool = multiprocessing.Pool(processes=min(workers, len(trails)), initializer=init_worker, initargs=(*feed.to_wkb(), cache))
+    try:
+        pending = {trail: pool.apply_async(generate_worker_report, (trail,)) for trail in trails}
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for trail, pending_report in pending.items():
+            try:
+                reports[trail], results = pending_report.get(None if deadline is None else max(0, deadline - time.monotonic()))
+                if cache is not None: cache.put_many(results)
+            except multiprocessing.TimeoutError:
+                print(f'{trail} report timed out')
+                reports[trail] = None
+                timed_out = True
+            except Exception as e: # the report couldn't be sent back
+                print(f'{trail} report failed to generate: {e}')
+                reports[trail] = None
+    finally:
+        if timed_out:
+            pool.terminate() # a hung worker would otherwise keep the pool alive into the next cycle
+        else:
+            pool.close()
+        pool.join()
+    return reports
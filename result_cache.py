@@ -0,0 +1,85 @@
+import json
+import time
+import sqlite3
+from collections import OrderedDict
+from typing import *
+
+# Per-fire FireTracker results keyed by (trail version, fire ID, geometry digest), so a perimeter that
+# hasn't changed since the last refresh cycle skips the geometry work. Entries are evicted least recently
+# used beyond max_entries and once older than ttl seconds. With a path they are also kept in SQLite, which
+# survives restarts and is shared with report worker processes.
+class ResultCache():
+    def __init__(self, max_entries: int = 20000, ttl: float = 7 * 24 * 60 * 60, path: Optional[str] = None) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.entries = OrderedDict() # key -> (time stored, result)
+        self.connection = None
+        self.hits = 0
+        self.misses = 0
+
+    # Sent to report workers without the connection, which each worker opens itself. The in-memory entries
+    # are only sent along when there is no SQLite file to read them from.
+    def __getstate__(self) -> dict:
+        state = {'max_entries': self.max_entries, 'ttl': self.ttl, 'path': self.path}
+        if self.path is None: state['entries'] = self.entries
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state['max_entries'], state['ttl'], state['path'])
+        self.entries = OrderedDict(state.get('entries', {}))
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def connect(self) -> Optional[sqlite3.Connection]:
+        if self.path is None or self.connection is not None: return self.connection
+        try:
+            self.connection = sqlite3.connect(self.path, timeout=30)
+            self.connection.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, stored REAL, result TEXT)')
+            self.connection.execute('DELETE FROM results WHERE stored < ?', (time.time() - self.ttl,))
+            self.connection.commit()
+        except sqlite3.Error as e:
+            print(f'Could not open result cache {self.path}: {e}')
+            self.path = None
+            self.connection = None
+        return self.connection
+
+    def get(self, key: str) -> Optional[dict]:
+        entry = self.entries.get(key)
+        if entry is None and self.connect() is not None:
+            try:
+                row = self.connection.execute('SELECT stored, result FROM results WHERE key = ?', (key,)).fetchone()
+            except sqlite3.Error as e:
+                print(f'Could not read result cache: {e}')
+                row = None
+            if row is not None:
+                entry = (row[0], json.loads(row[1]))
+                self.remember(key, entry)
+        if entry is None or entry[0] < time.time() - self.ttl:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: str, result: dict) -> None:
+        self.put_many({key: result})
+
+    # Store many results in one SQLite transaction
+    def put_many(self, results: Dict[str, dict]) -> None:
+        stored = time.time()
+        for key, result in results.items():
+            self.remember(key, (stored, result))
+        if results and self.connect() is not None:
+            try:
+                with self.connection:
+                    self.connection.executemany('INSERT OR REPLACE INTO results VALUES (?, ?, ?)', [(key, stored, json.dumps(result)) for key, result in results.items()])
+            except sqlite3.Error as e:
+                print(f'Could not write result cache: {e}')
+
+    def remember(self, key: str, entry: Tuple[float, dict]) -> None:
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
@@ -0,0 +1,51 @@
+import re
+from typing import *
+from twilio.twiml.messaging_response import MessagingResponse
+
+SEGMENT_LENGTH = 1600 # Twilio's limit for one message body; satellite messengers such as inReach need 160
+WINDOW_MILES = 100 # default trail miles either side of the mile marker in a message like 'PCT 1200'
+NUMBER = re.compile(r'(?<![\w.])(\d{1,3}(?:,\d{3})+(?!\d)|\d+)(\.\d+)?(?:\s?(?:miles?|mi)\b)?(?!\w|\.\d)') # e.g. 1200, 1,200.5 or 50mi
+
+# Split a report into messages of at most `length` characters, breaking between lines where possible
+def segment(text: str, length: int = SEGMENT_LENGTH) -> List[str]:
+    segments = []
+    current = ''
+    for line in text.rstrip('\n').split('\n'):
+        while len(line) > length: # a single line longer than a message is wrapped on a space
+            cut = line.rfind(' ', 0, length + 1)
+            cut = cut if cut > 0 else length
+            if current: segments.append(current)
+            segments.append(line[:cut].rstrip())
+            current = ''
+            line = line[cut:].lstrip()
+        candidate = f'{current}\n{line}' if current else line
+        if len(candidate) > length:
+            segments.append(current)
+            candidate = line
+        current = candidate
+    if current or not segments: segments.append(current)
+    return segments
+
+# TwiML for a report, rendered once per refresh so the webhook only has to look it up
+def render_twiml(text: str, length: int = SEGMENT_LENGTH) -> str:
+    resp = MessagingResponse()
+    for message in segment(text, length):
+        resp.message(message)
+    return str(resp)
+
+# Finds the first supported trail named in a message with one compiled pattern over every alias
+class TrailMatcher():
+    def __init__(self, trail_names: Dict[str, str]) -> None:
+        self.trails = {name.lower(): trail for name, trail in trail_names.items()}
+        aliases = sorted(trail_names.keys(), key=len, reverse=True) # prefer 'Pacific Crest Trail' over 'PCT'
+        self.pattern = re.compile(r'\b(' + '|'.join(re.escape(alias) for alias in aliases) + r')\b', re.IGNORECASE)
+
+    def match(self, message: str) -> Optional[str]:
+        found = self.pattern.search(message)
+        return self.trails[found.group(1).lower()] if found else None
+
+# Mile marker and window from a message like 'PCT 1200 100', or None for a whole-trail report
+def parse_window(message: str, miles: float = WINDOW_MILES) -> Optional[Tuple[float, float]]:
+    numbers = [float(match.group(1).replace(',', '') + (match.group(2) or '')) for match in NUMBER.finditer(message)]
+    if not numbers: return None
+    return numbers[0], numbers[1] if len(numbers) > 1 else miles
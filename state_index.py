@@ -0,0 +1,27 @@
+import numpy as np
+import shapely
+from typing import *
+from shapely import STRtree
+
+# Prepared state borders with an STRtree over their bounding boxes, so the states a fire
+# touches are found for every fire in one bulk query instead of testing vertices one by one
+class StateIndex():
+    def __init__(self, state_borders: List[object]) -> None:
+        self.states = [state_border['state'] for state_border in state_borders]
+        self.borders = np.empty(len(state_borders), dtype=object) # (lon, lat), as in the state WKT files
+        self.borders[:] = [state_border['border'] for state_border in state_borders]
+        shapely.prepare(self.borders)
+        self.tree = STRtree(self.borders)
+
+    # States intersecting each (lat, lon) fire, in the order the borders were given.
+    # A fire straddling a border counts for both states even if none of its vertices fall inside one.
+    def attribute(self, fires: Sequence[object]) -> List[List[str]]:
+        fires = np.asarray(fires, dtype=object)
+        states = [[] for _ in range(len(fires))]
+        if len(fires) == 0 or len(self.borders) == 0: return states
+        fires = shapely.transform(fires, lambda coords: coords[:, ::-1])
+        fire_indices, state_indices = self.tree.query(fires) # bounding box prefilter
+        hits = shapely.intersects(self.borders[state_indices], fires[fire_indices])
+        for fire, state in sorted(zip(fire_indices[hits].tolist(), state_indices[hits].tolist())):
+            states[fire].append(self.states[state])
+        return states
@@ -0,0 +1,232 @@
+import os
+import json
+import gpxpy
+import numpy as np
+import shapely
+from typing import *
+from shapely.geometry import LineString, Polygon
+from shapely.wkt import loads
+from trail_index import TrailIndex, EARTH_RADIUS
+from state_index import StateIndex
+
+TRAIL_DIR = './trail_wkt_files'
+STATE_DIR = './state_wkt_files'
+CACHE_DIR = './trail_cache' # WKB and .npy copies of the parsed WKT files, rebuilt when a source file changes
+LOD_TOLERANCES = [0.01, 0.001] # degrees (~0.7 and ~0.07 mi) of each simplified level, coarsest first
+BUFFER_MILES = 50 # width of a buffer computed for a trail without a buffer file
+
+# Everything about a trail that doesn't change between refresh cycles, parsed and prepared once
+# Levels are simplified copies of the trail and buffer, each within its tolerance of the full geometry,
+# and buffer_bounds are the polygons the coarsest buffer level guarantees are inside and around the buffer.
+class TrailAssets():
+    def __init__(self, trail: str, linestring: LineString, buffer: Polygon, index: TrailIndex, state_borders: List[object], stamps: dict,
+                 levels: Optional[List[dict]] = None, buffer_bounds: Optional[Tuple[Polygon, Polygon]] = None) -> None:
+        self.trail = trail
+        self.linestring = linestring
+        self.buffer = buffer
+        self.index = index
+        self.state_borders = state_borders
+        self.state_index = StateIndex(state_borders)
+        self.stamps = stamps
+        self.levels = levels or build_levels(linestring, buffer)
+        self.buffer_bounds = buffer_bounds or build_buffer_bounds(buffer, self.levels[0])
+        self._mile_markers = None
+        shapely.prepare(self.linestring)
+        shapely.prepare(self.buffer)
+        for level in self.levels:
+            shapely.prepare(level['linestring'])
+        shapely.prepare(list(self.buffer_bounds))
+
+    # The coarsest level with an error of at most `tolerance` degrees, or the full geometry
+    def level(self, tolerance: float) -> dict:
+        for level in self.levels:
+            if level['tolerance'] <= tolerance: return level
+        return {'tolerance': 0, 'linestring': self.linestring, 'buffer': self.buffer}
+
+    # Mile markers in the format dictionary[coordinate pair] = mile marker, built on first use
+    @property
+    def mile_markers(self) -> dict:
+        if self._mile_markers is None:
+            coords = map(tuple, self.index.coords[1:].tolist())
+            self._mile_markers = dict(zip(coords, self.index.miles[1:].tolist()))
+        return self._mile_markers
+
+    def set_state_borders(self, state_borders: List[object]) -> None:
+        if len(state_borders) != len(self.state_borders) or any(a is not b for a, b in zip(state_borders, self.state_borders)):
+            self.state_borders = state_borders
+            self.state_index = StateIndex(state_borders)
+
+    def is_current(self) -> bool:
+        return all(source_stamp(path) == stamp for path, stamp in self.stamps.items())
+
+# Topology-preserving simplification keeps every point of the result within the tolerance of the original and vice versa
+def build_levels(linestring: LineString, buffer: Polygon) -> List[dict]:
+    return [{
+        'tolerance': tolerance,
+        'linestring': shapely.simplify(linestring, tolerance, preserve_topology=True),
+        'buffer': shapely.simplify(buffer, tolerance, preserve_topology=True)
+    } for tolerance in LOD_TOLERANCES]
+
+# (outer, inner): a fire missing outer misses the buffer and a fire touching inner intersects it, so only fires
+# between the two need the full-resolution buffer. Checked once here; without a guarantee everything is checked in full.
+def build_buffer_bounds(buffer: Polygon, level: dict) -> Tuple[Polygon, Polygon]:
+    distance = level['tolerance'] * 1.1 # the 4-segment round joins stay within 2% of the true offset
+    outer = shapely.buffer(level['buffer'], distance, quad_segs=4)
+    inner = shapely.buffer(level['buffer'], -distance, quad_segs=4)
+    if not (shapely.contains(outer, buffer) and shapely.contains(buffer, inner)):
+        return buffer, Polygon()
+    return outer, inner
+
+_trail_assets = {}
+_state_borders = {}
+
+# Modification time and size of a source file, used to invalidate the cache, or None if it doesn't exist
+def source_stamp(path: str) -> Optional[List[int]]:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+def read_wkt(path: str) -> object:
+    with open(path, 'r') as wkt_file:
+        wkt_string = wkt_file.read()
+    return loads(wkt_string)
+
+# A GPX file's one track segment, or its one route if it has no tracks, as a (lat, lon) LineString like the
+# trail WKT files. Files often hold a route for the same path as their track, so routes are only a fallback.
+# Separate segments aren't joined, since that would invent a straight connector between them.
+def read_gpx(path: str) -> LineString:
+    with open(path, 'r') as gpx_file:
+        gpx = gpxpy.parse(gpx_file)
+    lines = [segment.points for track in gpx.tracks for segment in track.segments if segment.points]
+    lines = lines or [route.points for route in gpx.routes if route.points]
+    if len(lines) != 1: raise ValueError(f'{path} has {len(lines)} track segments or routes, expected one continuous line')
+    return LineString([(point.latitude, point.longitude) for point in lines[0]])
+
+def read_trail(path: str) -> LineString:
+    return read_gpx(path) if path.lower().endswith('.gpx') else read_wkt(path)
+
+# Buffer a (lat, lon) trail by `miles` in a sinusoidal plane centred on the trail, where degrees of longitude
+# are scaled by the cosine of their latitude. Accurate to a few percent over the length of a long trail.
+def compute_buffer(linestring: LineString, miles: float = BUFFER_MILES) -> Polygon:
+    center = shapely.get_coordinates(linestring)[:, 1].mean()
+    to_plane = lambda coords: np.column_stack((coords[:, 0], (coords[:, 1] - center) * np.cos(np.radians(coords[:, 0]))))
+    from_plane = lambda coords: np.column_stack((coords[:, 0], coords[:, 1] / np.cos(np.radians(coords[:, 0])) + center))
+    return shapely.transform(shapely.transform(linestring, to_plane).buffer(np.degrees(miles / EARTH_RADIUS)), from_plane)
+
+def read_stamps(cache_path: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(cache_path, 'stamps.json'), 'r') as stamps_file:
+            return json.load(stamps_file)
+    except (OSError, ValueError):
+        return None
+
+def write_cache(cache_path: str, stamps: dict, geometries: Dict[str, object] = None, arrays: Dict[str, np.ndarray] = None) -> None:
+    try:
+        os.makedirs(cache_path, exist_ok=True)
+        for name, geometry in (geometries or {}).items():
+            with open(os.path.join(cache_path, f'{name}.wkb.tmp'), 'wb') as wkb_file:
+                wkb_file.write(shapely.to_wkb(geometry))
+            os.replace(os.path.join(cache_path, f'{name}.wkb.tmp'), os.path.join(cache_path, f'{name}.wkb'))
+        for name, array in (arrays or {}).items():
+            with open(os.path.join(cache_path, f'{name}.npy.tmp'), 'wb') as npy_file:
+                np.save(npy_file, array)
+            os.replace(os.path.join(cache_path, f'{name}.npy.tmp'), os.path.join(cache_path, f'{name}.npy'))
+        # stamps are written last so a partially written cache is never considered valid
+        with open(os.path.join(cache_path, 'stamps.json.tmp'), 'w') as stamps_file:
+            json.dump(stamps, stamps_file)
+        os.replace(os.path.join(cache_path, 'stamps.json.tmp'), os.path.join(cache_path, 'stamps.json'))
+    except OSError as e:
+        print(f'Could not write trail cache {cache_path}: {e}')
+
+def read_wkb(cache_path: str, name: str) -> object:
+    with open(os.path.join(cache_path, f'{name}.wkb'), 'rb') as wkb_file:
+        return shapely.from_wkb(wkb_file.read())
+
+# Trail assets from a current cache, or None if it predates a file this version writes, e.g. after LOD_TOLERANCES changed
+def read_trail_cache(trail: str, cache_path: str, state_borders: List[object], stamps: dict) -> Optional[TrailAssets]:
+    try:
+        levels = [{
+            'tolerance': tolerance,
+            'linestring': read_wkb(cache_path, f'linestring_{tolerance:g}'),
+            'buffer': read_wkb(cache_path, f'buffer_{tolerance:g}')
+        } for tolerance in LOD_TOLERANCES]
+        buffer_bounds = (read_wkb(cache_path, 'buffer_outer'), read_wkb(cache_path, 'buffer_inner'))
+        coords = np.load(os.path.join(cache_path, 'coords.npy'), mmap_mode='r')
+        miles = np.load(os.path.join(cache_path, 'miles.npy'), mmap_mode='r')
+        return TrailAssets(trail, read_wkb(cache_path, 'linestring'), read_wkb(cache_path, 'buffer'), TrailIndex(coords, miles), state_borders, stamps, levels, buffer_bounds)
+    except (OSError, ValueError):
+        return None
+
+# Retrieve state border data as a prepared Shapely polygon
+def load_state_border(state: str) -> object:
+    path = f'{STATE_DIR}/{state.lower().replace(" ", "_")}.wkt'
+    stamps = {path: source_stamp(path)}
+    if state in _state_borders and _state_borders[state]['stamps'] == stamps:
+        return _state_borders[state]
+    cache_path = f'{CACHE_DIR}/states/{state.lower().replace(" ", "_")}'
+    if read_stamps(cache_path) == stamps:
+        polygon = read_wkb(cache_path, 'border')
+    else:
+        polygon = read_wkt(path)
+        write_cache(cache_path, stamps, geometries={'border': polygon})
+    shapely.prepare(polygon)
+    _state_borders[state] = {
+        'state': state,
+        'border': polygon,
+        'stamps': stamps
+    }
+    return _state_borders[state]
+
+# Trail and buffer files, by default ./trail_wkt_files/{trail}.wkt and {trail}_buffer.wkt. The trail can be WKT
+# or GPX; without a buffer file the buffer is computed from the trail.
+def trail_sources(trail: str, path: Optional[str] = None, buffer_path: Optional[str] = None) -> Dict[str, Optional[List[int]]]:
+    path = path or f'{TRAIL_DIR}/{trail}.wkt'
+    buffer_path = buffer_path or f'{TRAIL_DIR}/{trail}_buffer.wkt'
+    return {path: source_stamp(path), buffer_path: source_stamp(buffer_path)} # a missing buffer file is stamped None
+
+# Load a trail's linestring, buffer, mile markers and state borders from memory, the binary cache or the source files
+def load_trail_assets(trail: str, states: List[str], path: Optional[str] = None, buffer_path: Optional[str] = None) -> TrailAssets:
+    state_borders = [load_state_border(state) for state in states]
+    assets = _trail_assets.get(trail)
+    stamps = trail_sources(trail, path, buffer_path)
+    if assets is not None and assets.stamps == stamps:
+        assets.set_state_borders(state_borders)
+        return assets
+    trail_path, buffer_path = stamps.keys()
+    if stamps[trail_path] is None: raise FileNotFoundError(trail_path)
+    cache_path = f'{CACHE_DIR}/{trail}'
+    assets = read_trail_cache(trail, cache_path, state_borders, stamps) if read_stamps(cache_path) == stamps else None
+    if assets is None:
+        linestring = read_trail(trail_path)
+        buffer = read_wkt(buffer_path) if stamps[buffer_path] is not None else compute_buffer(linestring)
+        assets = TrailAssets(trail, linestring, buffer, TrailIndex.from_linestring(linestring), state_borders, stamps)
+        geometries = {'linestring': linestring, 'buffer': buffer, 'buffer_outer': assets.buffer_bounds[0], 'buffer_inner': assets.buffer_bounds[1]}
+        for level in assets.levels:
+            geometries[f"linestring_{level['tolerance']:g}"] = level['linestring']
+            geometries[f"buffer_{level['tolerance']:g}"] = level['buffer']
+        write_cache(cache_path, stamps, geometries=geometries, arrays={'coords': assets.index.coords, 'miles': assets.index.miles})
+        write_cache(f'{CACHE_DIR}/bounds/{trail}', stamps, arrays={'bounds': shapely.bounds(buffer)})
+    _trail_assets[trail] = assets
+    return assets
+
+# (min lat, min lon, max lat, max lon) of a trail's buffer, so that matching fires to trails doesn't load trails
+# without any fires nearby. Read from its own small cache, or from the buffer file alone, never registering the trail.
+def load_buffer_bounds(trail: str, path: Optional[str] = None, buffer_path: Optional[str] = None) -> np.ndarray:
+    stamps = trail_sources(trail, path, buffer_path)
+    assets = _trail_assets.get(trail)
+    if assets is not None and assets.stamps == stamps:
+        return shapely.bounds(assets.buffer)
+    cache_path = f'{CACHE_DIR}/bounds/{trail}'
+    if read_stamps(cache_path) == stamps:
+        try:
+            return np.load(os.path.join(cache_path, 'bounds.npy'))
+        except (OSError, ValueError):
+            pass
+    trail_path, buffer_path = stamps.keys()
+    if stamps[trail_path] is None: raise FileNotFoundError(trail_path)
+    buffer = read_wkt(buffer_path) if stamps[buffer_path] is not None else compute_buffer(read_trail(trail_path))
+    bounds = shapely.bounds(buffer)
+    write_cache(cache_path, stamps, arrays={'bounds': bounds})
+    return bounds
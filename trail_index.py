@@ -0,0 +1,119 @@
+import numpy as np
+import shapely
+from typing import *
+from scipy.spatial import cKDTree
+from shapely import STRtree
+from shapely.geometry import LineString
+
+EARTH_RADIUS = 3959.87433 # radius in miles
+
+# Vectorized haversine distance in miles between (lat, lon) arrays
+def haversine(lat1: np.ndarray, lon1: np.ndarray, lat2: np.ndarray, lon2: np.ndarray) -> np.ndarray:
+    lat1, lon1, lat2, lon2 = (np.radians(v) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+# (lat, lon) pairs to points on the unit sphere, where chord length is monotonic in great circle distance
+def to_unit_vectors(coords: np.ndarray) -> np.ndarray:
+    lat = np.radians(coords[:, 0])
+    lon = np.radians(coords[:, 1])
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+def as_points(points: Iterable[Sequence[float]]) -> np.ndarray:
+    points = np.asarray(points, dtype=float)
+    if points.size == 0: return np.empty((0, 2))
+    return points.reshape(-1, points.shape[-1])[:, :2]
+
+# Precomputed trail coordinates and cumulative miles with a KD-tree over the vertices,
+# so mile marker lookups are O(log n) and batched for every fire at once
+class TrailIndex():
+    segments = None # trail segments as LineStrings, built on the first projection or nearest distance query
+    segment_tree = None
+
+    def __init__(self, coords: np.ndarray, miles: Optional[np.ndarray] = None) -> None:
+        self.coords = as_points(coords) # (lat, lon), same axis order as the trail WKT
+        if miles is None:
+            steps = haversine(self.coords[:-1, 0], self.coords[:-1, 1], self.coords[1:, 0], self.coords[1:, 1])
+            miles = np.concatenate(([0.0], np.cumsum(steps)))
+        self.miles = np.asarray(miles, dtype=float)
+        self.tree = cKDTree(to_unit_vectors(self.coords))
+
+    @classmethod
+    def from_linestring(cls, trail: LineString) -> 'TrailIndex':
+        return cls(np.asarray(trail.coords))
+
+    # Index of the trail vertex closest to each point
+    def nearest_vertex(self, points: Iterable[Sequence[float]]) -> np.ndarray:
+        points = as_points(points)
+        if len(points) == 0: return np.empty(0, dtype=int)
+        _, indices = self.tree.query(to_unit_vectors(points))
+        return indices
+
+    # Mile marker for each point, either snapped to the closest trail vertex or
+    # projected onto the closest trail segment (linear referencing)
+    def mile_markers(self, points: Iterable[Sequence[float]], project: bool = False) -> np.ndarray:
+        if project: return self.project(points)
+        return self.miles[self.nearest_vertex(points)]
+
+    # Mile of the closest point on the trail to each point. The STRtree finds the nearest segment in degree
+    # space, which bounds the search radius for the true nearest segment in a local plane scaled for longitude.
+    def project(self, points: Iterable[Sequence[float]]) -> np.ndarray:
+        points = as_points(points)
+        if len(points) == 0: return np.empty(0)
+        if len(self.coords) < 2: return np.zeros(len(points))
+        tree = self.build_segment_tree()
+        geometries = shapely.points(points)
+        (inputs, _), nearest = tree.query_nearest(geometries, return_distance=True, all_matches=False)
+        radius = np.zeros(len(points))
+        radius[inputs] = nearest / np.cos(np.radians(np.minimum(np.abs(points[inputs, 0]) + nearest, 89.0))) + 1e-9
+        owners, starts = tree.query(geometries, predicate='dwithin', distance=radius)
+        a = self.coords[starts]
+        b = self.coords[starts + 1]
+        # local equirectangular plane around each point, in degrees of latitude
+        p = points[owners]
+        scale = np.cos(np.radians(p[:, 0]))
+        ax, ay = (a[:, 1] - p[:, 1]) * scale, a[:, 0] - p[:, 0]
+        bx, by = (b[:, 1] - p[:, 1]) * scale, b[:, 0] - p[:, 0]
+        dx, dy = bx - ax, by - ay
+        length = dx ** 2 + dy ** 2
+        t = np.divide(-(ax * dx + ay * dy), length, out=np.zeros_like(length), where=length > 0)
+        t = np.clip(t, 0, 1)
+        distance = (ax + t * dx) ** 2 + (ay + t * dy) ** 2
+        order = np.lexsort((starts, distance, owners)) # closest segment of each point first, earliest on ties
+        _, first = np.unique(owners[order], return_index=True)
+        best = order[first]
+        segment, t = starts[best], t[best]
+        return self.miles[segment] + t * (self.miles[segment + 1] - self.miles[segment])
+
+    def build_segment_tree(self) -> STRtree:
+        if self.segment_tree is None:
+            self.segments = shapely.linestrings(np.stack((self.coords[:-1], self.coords[1:]), axis=1))
+            self.segment_tree = STRtree(self.segments)
+        return self.segment_tree
+
+    # Exact minimum distance in miles from each fire to the trail, with the closest trail and fire points.
+    # The STRtree finds the nearest segment in degree space, which bounds the search radius for the
+    # true nearest segment; those candidates are then compared in a local plane scaled for longitude.
+    def closest_points(self, fires: Sequence[object]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        fires = np.asarray(fires, dtype=object)
+        distances = np.full(len(fires), np.inf)
+        trail_points = np.full((len(fires), 2), np.nan)
+        fire_points = np.full((len(fires), 2), np.nan)
+        if len(fires) == 0 or len(self.coords) < 2: return distances, trail_points, fire_points
+        tree = self.build_segment_tree()
+        (inputs, _), nearest = tree.query_nearest(fires, return_distance=True, all_matches=False)
+        bounds = shapely.bounds(fires[inputs]) # (min lat, min lon, max lat, max lon)
+        max_lat = np.minimum(np.abs(bounds[:, [0, 2]]).max(axis=1) + nearest, 89.0)
+        radius = nearest / np.cos(np.radians(max_lat)) + 1e-9
+        pairs = tree.query(fires[inputs], predicate='dwithin', distance=radius)
+        groups = np.split(pairs[1], np.searchsorted(pairs[0], np.arange(1, len(inputs))))
+        for i, fire_bounds, candidates in zip(inputs, bounds, groups):
+            scale = np.array([1.0, np.cos(np.radians((fire_bounds[0] + fire_bounds[2]) / 2))])
+            fire_plane = shapely.transform(fires[i], lambda c: c * scale)
+            shapely.prepare(fire_plane)
+            trail_plane = shapely.transform(shapely.multilinestrings(self.segments[candidates]), lambda c: c * scale)
+            fire_point, trail_point = shapely.get_coordinates(shapely.shortest_line(fire_plane, trail_plane)) / scale
+            distances[i] = haversine(fire_point[0], fire_point[1], trail_point[0], trail_point[1])
+            trail_points[i] = trail_point
+            fire_points[i] = fire_point
+        return distances, trail_points, fire_points
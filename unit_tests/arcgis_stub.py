@@ -0,0 +1,95 @@
+import re
+import json
+import threading
+import datetime
+from typing import *
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Local stand-in for the WFIGS perimeter FeatureServer query endpoint, so feed syncing can be tested offline.
+# Supports the parts of the ArcGIS query API that FireStore uses: returnIdsOnly, returnCountOnly, outFields,
+# envelope filters, paging with a server record limit, OBJECTID IN (...) and edit date >= TIMESTAMP '...' where clauses.
+class ArcGISStub():
+    def __init__(self, features: List[object], max_record_count: int = 1000, edit_date_field: Optional[str] = 'EditDate') -> None:
+        self.features = features
+        self.max_record_count = max_record_count
+        self.edit_date_field = edit_date_field # reported in the layer's editFieldsInfo, or None for a layer without edit tracking
+        self.requests = [] # parsed query parameters of every request received
+        self.truncate = None # bytes of each feature page actually sent, to test failed downloads
+        self.drop_connection = True # whether a truncated page still declares its full Content-Length
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                params = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+                stub.requests.append(params)
+                if urlparse(self.path).path.endswith('/query'):
+                    response = stub.respond(params)
+                    body = json.dumps(response).encode()
+                else:
+                    response = stub.layer_info()
+                    body = json.dumps(response).encode()
+                length = len(body)
+                if stub.truncate is not None and 'features' in response:
+                    body = body[:stub.truncate]
+                    if not stub.drop_connection: length = len(body)
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(length))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: object) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/FeatureServer/0/query'
+
+    def __enter__(self) -> 'ArcGISStub':
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def layer_info(self) -> dict:
+        info = {'maxRecordCount': self.max_record_count}
+        if self.edit_date_field: info['editFieldsInfo'] = {'creationDateField': 'CreateDate', 'editDateField': self.edit_date_field}
+        return info
+
+    def matches(self, feature: object, where: str) -> bool:
+        attributes = feature['attributes']
+        if where == '1=1': return True
+        object_ids = re.match(r'OBJECTID IN \((.*)\)', where)
+        if object_ids:
+            return attributes['OBJECTID'] in {int(object_id) for object_id in object_ids.group(1).split(',')}
+        for field, timestamp in re.findall(r"(\w+) >= TIMESTAMP '([^']*)'", where):
+            since = datetime.datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S').replace(tzinfo=datetime.timezone.utc).timestamp() * 1000
+            if (attributes.get(field) or 0) >= since: return True
+        return False
+
+    def in_envelope(self, feature: object, geometry: Optional[str]) -> bool:
+        if geometry is None: return True
+        xmin, ymin, xmax, ymax = map(float, geometry.split(','))
+        points = [point for ring in feature['geometry']['rings'] for point in ring]
+        return min(p[0] for p in points) <= xmax and max(p[0] for p in points) >= xmin and min(p[1] for p in points) <= ymax and max(p[1] for p in points) >= ymin
+
+    def respond(self, params: dict) -> dict:
+        features = [feature for feature in self.features if self.matches(feature, params.get('where', '1=1')) and self.in_envelope(feature, params.get('geometry'))]
+        if params.get('returnIdsOnly') == 'true':
+            return {'objectIdFieldName': 'OBJECTID', 'objectIds': [feature['attributes']['OBJECTID'] for feature in features]}
+        if params.get('returnCountOnly') == 'true':
+            return {'count': len(features)}
+        features = sorted(features, key=lambda feature: feature['attributes']['OBJECTID'])
+        offset = int(params.get('resultOffset', 0))
+        count = min(int(params.get('resultRecordCount', self.max_record_count)), self.max_record_count)
+        page = features[offset:offset + count]
+        fields = params.get('outFields', '*').split(',')
+        return {
+            'features': [{
+                'attributes': {key: value for key, value in feature['attributes'].items() if '*' in fields or key in fields},
+                'geometry': feature['geometry']
+            } for feature in page],
+            'exceededTransferLimit': offset + count < len(features)
+        }
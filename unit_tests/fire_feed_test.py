@@ -0,0 +1,87 @@
+import unittest
+import copy
+import sys
+import os
+import numpy as np
+from typing import *
+from shapely.geometry import box
+
+app_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, app_dir)
+
+from fire_feed import FireFeed, parse_fire
+
+class FireFeedUnitTesting(unittest.TestCase):
+
+    test_fires = [
+        {'attributes': {'poly_IncidentName': 'North'}, 'geometry': {'rings': [[[-106.0, 40.0], [-105.9, 40.1], [-105.8, 40.0], [-106.0, 40.0]]]}},
+        {'attributes': {'poly_IncidentName': 'South'}, 'geometry': {'rings': [[[-106.0, 37.0], [-105.9, 37.1], [-105.8, 37.0], [-106.0, 37.0]]]}},
+        {'attributes': {'poly_IncidentName': 'East'}, 'geometry': {'rings': [[[-100.0, 38.0], [-99.9, 38.1], [-99.8, 38.0], [-100.0, 38.0]]]}}
+    ]
+
+    # buffers are in (lat, lon) like the trail WKT files
+    buffers = {
+        'NORTH': box(39.5, -106.5, 40.5, -105.5),
+        'ALL': box(36.5, -106.5, 40.5, -105.5)
+    }
+
+    def test_feed_not_mutated(self) -> None:
+        fires = copy.deepcopy(self.test_fires)
+        feed = FireFeed(fires)
+        self.assertEqual(fires, self.test_fires)
+        self.assertEqual(feed.shapes[0].exterior.coords[0], (40.0, -106.0))
+        self.assertFalse(feed.shapes.flags.writeable)
+
+    def test_match_trails(self) -> None:
+        feed = FireFeed(copy.deepcopy(self.test_fires))
+        candidates = feed.match_trails(self.buffers)
+        self.assertEqual(candidates['NORTH'].tolist(), [0])
+        self.assertEqual(candidates['ALL'].tolist(), [0, 1])
+        self.assertIs(feed.close_fires('ALL', self.buffers['ALL']), candidates['ALL'])
+
+    # the coarse bounds only decide fires clearly inside or outside, the rest are tested against the buffer
+    def test_match_trails_with_bounds(self) -> None:
+        feed = FireFeed(copy.deepcopy(self.test_fires))
+        buffer = self.buffers['ALL']
+        bounds = {'ALL': (buffer.buffer(0.2), buffer.buffer(-0.45))}
+        self.assertEqual(feed.match_trails({'ALL': buffer}, bounds)['ALL'].tolist(), [0, 1])
+        far = {'ALL': (buffer.buffer(10), box(39.5, -106.5, 40.5, -105.5))}
+        self.assertEqual(feed.match_trails({'ALL': buffer}, far)['ALL'].tolist(), [0, 1])
+
+    # ArcGIS outer rings are clockwise and holes counter-clockwise, in (lon, lat)
+    def test_parse_fire_rings(self) -> None:
+        outer = [[-106.0, 40.0], [-106.0, 40.4], [-105.6, 40.4], [-105.6, 40.0], [-106.0, 40.0]]
+        hole = [[-105.9, 40.1], [-105.7, 40.1], [-105.7, 40.3], [-105.9, 40.3], [-105.9, 40.1]]
+        spot = [[-105.0, 40.0], [-105.0, 40.1], [-104.9, 40.1], [-104.9, 40.0], [-105.0, 40.0]]
+        shape = parse_fire({'geometry': {'rings': [outer, spot, hole]}})
+        self.assertEqual(shape.geom_type, 'MultiPolygon')
+        self.assertEqual(sorted(len(polygon.interiors) for polygon in shape.geoms), [0, 1])
+        self.assertAlmostEqual(shape.area, 0.16 - 0.04 + 0.01)
+        self.assertFalse(shape.contains(box(40.15, -105.85, 40.25, -105.75))) # (lat, lon) point in the hole
+        self.assertTrue(shape.is_valid)
+
+    # the feed doesn't always repeat the first point at the end of a ring
+    def test_parse_fire_unclosed_rings(self) -> None:
+        triangle = [[-106.0, 40.0], [-106.0, 40.4], [-105.6, 40.0]]
+        self.assertAlmostEqual(parse_fire({'geometry': {'rings': [triangle]}}).area, 0.08)
+        outer = [[-106.0, 40.0], [-106.0, 40.4], [-105.6, 40.4], [-105.6, 40.0]]
+        hole = [[-105.9, 40.1], [-105.7, 40.1], [-105.7, 40.3], [-105.9, 40.3]]
+        shape = parse_fire({'geometry': {'rings': [outer, hole]}})
+        self.assertEqual(shape.geom_type, 'Polygon')
+        self.assertEqual(len(shape.interiors), 1)
+        self.assertAlmostEqual(shape.area, 0.16 - 0.04)
+        self.assertTrue(parse_fire({'geometry': {'rings': [[[-106.0, 40.0], [-106.0, 40.4], [-106.0, 40.0]]]}}).is_empty)
+
+    def test_parse_fire_invalid(self) -> None:
+        bowtie = [[-106.0, 40.0], [-105.9, 40.1], [-105.9, 40.0], [-106.0, 40.1], [-106.0, 40.0]]
+        shape = parse_fire({'geometry': {'rings': [bowtie]}})
+        self.assertTrue(shape.is_valid)
+        self.assertIn(shape.geom_type, ('Polygon', 'MultiPolygon'))
+        self.assertTrue(parse_fire({'geometry': {'rings': []}}).is_empty)
+
+    def test_empty_feed(self) -> None:
+        feed = FireFeed([])
+        self.assertEqual(len(feed.close_fires('ALL', self.buffers['ALL'])), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+import unittest
+import sys
+import os
+import io
+import json
+import numpy as np
+import requests
+from typing import *
+from shapely.geometry import box
+
+app_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, app_dir)
+sys.path.insert(0, os.path.dirname(__file__))
+
+from arcgis_stub import ArcGISStub
+from fire_feed import FireStore, FIRE_FIELDS, MAX_ALLOWABLE_OFFSET, stream_features
+
+class FireStoreUnitTesting(unittest.TestCase):
+
+    def fire(self, object_id: int, edited: int, lon: float = -106.0, stored: Optional[int] = None) -> object:
+        return {
+            'attributes': {
+                'OBJECTID': object_id,
+                'poly_IncidentName': f'Fire {object_id}',
+                'attr_FireDiscoveryDateTime': 1677106499000,
+                'attr_IncidentSize': 50,
+                'attr_PercentContained': 95,
+                'poly_DateCurrent': edited,
+                'attr_ModifiedOnDateTime_dt': edited,
+                'attr_InitialLatitude': 39.0,
+                'EditDate': stored or edited
+            },
+            'geometry': {'rings': [[[lon, 39.0], [lon + 0.1, 39.1], [lon + 0.2, 39.0], [lon, 39.0]]]}
+        }
+
+    def test_initial_sync(self) -> None:
+        with ArcGISStub([self.fire(1, 1677000000000), self.fire(2, 1677000000000)]) as stub:
+            store = FireStore(stub.url)
+            self.assertEqual(store.sync(), {1, 2})
+            self.assertEqual(stub.requests[-1]['outFields'], ','.join(FIRE_FIELDS + ['EditDate']))
+            self.assertNotIn('attr_InitialLatitude', store.fires[1]['attributes'])
+            self.assertEqual(len(store.feed()), 2)
+
+    def test_incremental_sync(self) -> None:
+        with ArcGISStub([self.fire(1, 1677000000000), self.fire(2, 1677000000000)]) as stub:
+            store = FireStore(stub.url)
+            store.sync()
+            shape = store.shapes[1]
+            self.assertEqual(store.sync(), set())
+            stub.features[1] = self.fire(2, 1677100000000, lon=-105.0)
+            stub.features.append(self.fire(3, 1677100000000))
+            self.assertEqual(store.sync(), {2, 3})
+            self.assertIn('TIMESTAMP', stub.requests[-1]['where'])
+            self.assertIs(store.shapes[1], shape)
+            self.assertEqual(store.shapes[2].exterior.coords[0], (39.0, -105.0))
+            del stub.features[0]
+            self.assertEqual(store.sync(), {1})
+            self.assertEqual(sorted(store.fires), [2, 3])
+
+    # a perimeter stored after the last sync is fetched even though its data dates are older
+    def test_late_upload(self) -> None:
+        with ArcGISStub([self.fire(1, 1677100000000)]) as stub:
+            store = FireStore(stub.url)
+            store.sync()
+            stub.features[0] = self.fire(1, 1677050000000, lon=-105.0, stored=1677200000000)
+            self.assertEqual(store.sync(), {1})
+            self.assertEqual(stub.requests[-1]['where'], "EditDate >= TIMESTAMP '2023-02-22 20:56:40'") # 10 minutes before the first sync's edit
+            self.assertEqual(store.shapes[1].exterior.coords[0], (39.0, -105.0))
+
+    def test_sync_without_edit_tracking(self) -> None:
+        with ArcGISStub([self.fire(1, 1677100000000), self.fire(2, 1677100000000)], edit_date_field=None) as stub:
+            store = FireStore(stub.url)
+            store.sync()
+            shape = store.shapes[1]
+            stub.features[1] = self.fire(2, 1677050000000, lon=-105.0)
+            self.assertEqual(store.sync(), {2})
+            self.assertEqual(stub.requests[-1]['where'], '1=1')
+            self.assertIs(store.shapes[1], shape)
+
+    def test_paged_sync(self) -> None:
+        with ArcGISStub([self.fire(i, 1677000000000) for i in range(1, 26)], max_record_count=4) as stub:
+            store = FireStore(stub.url)
+            self.assertEqual(store.sync(), set(range(1, 26)))
+            offsets = sorted(int(params['resultOffset']) for params in stub.requests if 'resultOffset' in params)
+            self.assertEqual(offsets, list(range(0, 25, 4)))
+            self.assertEqual(stub.requests[-1]['maxAllowableOffset'], str(MAX_ALLOWABLE_OFFSET))
+
+    def test_streamed_sync_matches_json(self) -> None:
+        with ArcGISStub([self.fire(i, 1677000000000, lon=-106.0 + i) for i in range(1, 8)], max_record_count=3) as stub:
+            streamed = FireStore(stub.url, stream=True)
+            parsed = FireStore(stub.url, stream=False)
+            self.assertEqual(streamed.sync(), parsed.sync())
+            for object_id, fire in parsed.fires.items():
+                self.assertEqual(streamed.fires[object_id]['attributes'], fire['attributes'])
+                self.assertIsInstance(streamed.fires[object_id]['geometry']['rings'][0], np.ndarray)
+                self.assertTrue(streamed.shapes[object_id].equals(parsed.shapes[object_id]))
+            self.assertGreater(streamed.stats['bytes'], 0)
+            self.assertEqual(streamed.sync(), set()) # streamed geometries compare equal to the stored ones
+
+    # a page cut short raises what call_api retries on, streamed or not
+    def test_truncated_page(self) -> None:
+        with ArcGISStub([self.fire(i, 1677000000000) for i in range(1, 4)]) as stub:
+            stub.truncate = 200
+            for stream in (True, False):
+                with self.assertRaises(requests.exceptions.RequestException):
+                    FireStore(stub.url, stream=stream).sync()
+            stub.drop_connection = False # a complete response holding malformed JSON
+            for stream in (True, False):
+                with self.assertRaises(ValueError):
+                    FireStore(stub.url, stream=stream).sync()
+
+    def test_stream_features(self) -> None:
+        body = {'exceededTransferLimit': True, 'features': [
+            {'attributes': {'OBJECTID': 1, 'poly_IncidentName': 'Two Rings'}, 'geometry': {'rings': [[[0, 0], [0, 1], [1, 1], [0, 0]], [[5, 5], [5, 6], [6, 6], [5, 5]]]}},
+            {'attributes': {'OBJECTID': 2, 'poly_IncidentName': None}, 'geometry': None}
+        ]}
+        response = {}
+        features = list(stream_features(io.BytesIO(json.dumps(body).encode()), response))
+        self.assertTrue(response['exceededTransferLimit'])
+        self.assertEqual(features[0]['attributes'], {'OBJECTID': 1, 'poly_IncidentName': 'Two Rings'})
+        self.assertEqual([ring.tolist() for ring in features[0]['geometry']['rings']], body['features'][0]['geometry']['rings'])
+        self.assertEqual(features[1]['geometry']['rings'], [])
+        with self.assertRaises(ValueError):
+            list(stream_features(io.BytesIO(b'{"error": {"code": 400, "message": "Invalid query", "details": []}}'), {}))
+
+    def test_spatial_filter(self) -> None:
+        with ArcGISStub([self.fire(1, 1677000000000), self.fire(2, 1677000000000, lon=-120.0), self.fire(3, 1677000000000, lon=-110.0)]) as stub:
+            store = FireStore(stub.url)
+            buffers = [box(38.5, -106.5, 39.5, -105.5), box(38.5, -120.5, 39.5, -119.5)] # (lat, lon)
+            store.set_spatial_filter(buffers, combine=False)
+            self.assertEqual(store.sync(), {1, 2})
+            self.assertEqual(stub.requests[-1]['geometryType'], 'esriGeometryEnvelope')
+            store.set_spatial_filter(buffers)
+            self.assertEqual(store.envelopes, [(-120.5, 38.5, -105.5, 39.5)])
+            self.assertEqual(store.sync(), {3})
+
+    def test_signature_only_changes_with_nearby_fires(self) -> None:
+        with ArcGISStub([self.fire(1, 1677000000000), self.fire(2, 1677000000000, lon=-120.0)]) as stub:
+            store = FireStore(stub.url)
+            store.sync()
+            buffers = {'CT': store.shapes[1].buffer(0.5)}
+            feed = store.feed()
+            feed.match_trails(buffers)
+            signature = feed.signature('CT')
+            stub.features[1] = self.fire(2, 1677100000000, lon=-121.0)
+            store.sync()
+            feed = store.feed()
+            feed.match_trails(buffers)
+            self.assertEqual(feed.signature('CT'), signature)
+            stub.features[0] = self.fire(1, 1677100000000)
+            store.sync()
+            feed = store.feed()
+            feed.match_trails(buffers)
+            self.assertNotEqual(feed.signature('CT'), signature)
+
+    # edits that keep the fire's data dates still change the signature
+    def test_signature_changes_with_edits(self) -> None:
+        with ArcGISStub([self.fire(1, 1677000000000)], edit_date_field=None) as stub:
+            store = FireStore(stub.url)
+            store.sync()
+            buffers = {'CT': store.shapes[1].buffer(0.5)}
+            signatures = []
+            resized = dict(stub.features[0], attributes=dict(stub.features[0]['attributes'], attr_IncidentSize=5000))
+            for fire in (resized, dict(resized, geometry=self.fire(1, 1677000000000, lon=-105.95)['geometry'])):
+                feed = store.feed()
+                feed.match_trails(buffers)
+                signatures.append(feed.signature('CT'))
+                stub.features[0] = fire
+                self.assertEqual(store.sync(), {1})
+            feed = store.feed()
+            feed.match_trails(buffers)
+            signatures.append(feed.signature('CT'))
+            self.assertEqual(len(set(signatures)), 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+import sys
+import os
+import tempfile
+from typing import *
+
+app_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, app_dir)
+
+from metrics import Metrics, profile_cycle
+
+class MetricsUnitTesting(unittest.TestCase):
+
+    def test_prometheus_text(self) -> None:
+        metrics = Metrics()
+        metrics.set('fire_fetch_bytes', 2048, 'Bytes downloaded by the last feed sync')
+        metrics.set('fire_stage_seconds', 0.5, 'Time per stage', trail='PCT', stage='get_close_fires')
+        metrics.set('fire_stage_seconds', 0.25, trail='CT', stage='get_close_fires')
+        text = metrics.render()
+        self.assertIn('# HELP fire_fetch_bytes Bytes downloaded by the last feed sync\n# TYPE fire_fetch_bytes gauge\nfire_fetch_bytes 2048.0\n', text)
+        self.assertIn('fire_stage_seconds{stage="get_close_fires",trail="CT"} 0.25\n', text)
+        self.assertIn('fire_stage_seconds{stage="get_close_fires",trail="PCT"} 0.5\n', text)
+        self.assertEqual(text.count('# TYPE fire_stage_seconds gauge'), 1)
+
+    def test_snapshot_replace(self) -> None:
+        metrics = Metrics()
+        with metrics.timer('fire_refresh_seconds'):
+            pass
+        copy = Metrics()
+        copy.replace(metrics.snapshot())
+        self.assertEqual(copy.render(), metrics.render())
+
+    def test_profile_cycle(self) -> None:
+        metrics = Metrics()
+        with tempfile.TemporaryDirectory() as directory:
+            with profile_cycle('cprofile', metrics, directory):
+                sum(range(1000))
+            with profile_cycle('tracemalloc', metrics, directory):
+                [0] * 10000
+            with profile_cycle(None, metrics, directory):
+                pass
+            files = sorted(os.listdir(directory))
+            self.assertTrue(any(name.endswith('.prof') for name in files))
+            self.assertTrue(any(name.endswith('.tracemalloc.txt') for name in files))
+        self.assertIn('fire_refresh_peak_bytes', metrics.render())
+
+if __name__ == '__main__':
+    unittest.main()
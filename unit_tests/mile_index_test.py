@@ -0,0 +1,43 @@
+import unittest
+import sys
+import os
+import random
+from typing import *
+
+app_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, app_dir)
+
+import numpy as np
+from mile_index import MileIntervalIndex, merge_intervals
+
+class MileIndexUnitTesting(unittest.TestCase):
+
+    def test_matches_linear_scan(self) -> None:
+        rng = random.Random(3)
+        intervals = []
+        for i in range(300):
+            start = rng.uniform(0, 2650)
+            intervals.append((start, start + rng.choice([0, rng.uniform(0, 40)]), i))
+        index = MileIntervalIndex(intervals)
+        self.assertEqual(len(index), 300)
+        for _ in range(200):
+            mile = rng.uniform(-100, 2750)
+            miles = rng.choice([0, 10, 100])
+            expected = sorted((start, end, i) for start, end, i in intervals if start <= mile + miles and end >= mile - miles)
+            self.assertEqual(index.query(mile - miles, mile + miles), [i for _, _, i in expected])
+
+    def test_reversed_and_point_intervals(self) -> None:
+        index = MileIntervalIndex([(50, 40, 'reversed'), (45, 45, 'point')])
+        self.assertEqual(index.query(45, 45), ['reversed', 'point'])
+        self.assertEqual(index.query(0, 39.9), [])
+        self.assertEqual(MileIntervalIndex([]).query(0, 100), [])
+
+    def test_merge_intervals(self) -> None:
+        owners, starts, ends = merge_intervals(np.array([1, 0, 0, 1, 0, 1]), np.array([5.0, 12.0, 1.0, 3.0, 10.3, 20.0]), np.array([8.0, 10.7, 2.0, 4.0, 10.0, 20.0]), 0.5)
+        self.assertEqual(owners.tolist(), [0, 0, 1, 1, 1])
+        self.assertEqual(starts.tolist(), [1.0, 10.0, 3.0, 5.0, 20.0])
+        self.assertEqual(ends.tolist(), [2.0, 12.0, 4.0, 8.0, 20.0])
+        self.assertEqual(len(merge_intervals(np.array([], dtype=int), np.array([]), np.array([]))[0]), 0)
+
+if __name__ == '__main__':
+    unittest.main()
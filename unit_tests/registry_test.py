@@ -0,0 +1,101 @@
+import unittest
+import sys
+import os
+import json
+import tempfile
+import numpy as np
+from typing import *
+from shapely.geometry import LineString, Point, box
+
+app_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, app_dir)
+
+import trail_assets
+import registry
+from firetracker import FireTracker
+from fire_feed import FireFeed
+from reports import generate_reports, empty_report
+
+class RegistryUnitTesting(unittest.TestCase):
+
+    manifest = {
+        'trails': [
+            {'code': 'NT', 'name': 'North Trail', 'states': ['Colorado'], 'aliases': ['Northern Route']},
+            {'code': 'ST', 'name': 'South Trail', 'states': ['Colorado'], 'file': 'south.gpx'}
+        ]
+    }
+
+    # a fire on the North Trail, more than 50 miles from the South Trail
+    test_fires = [
+        {
+            'attributes': {'poly_IncidentName': 'Ridge', 'attr_FireDiscoveryDateTime': 1677106499000, 'attr_IncidentSize': 50, 'attr_PercentContained': 10},
+            'geometry': {'rings': [[[-106.2, 40.4], [-105.8, 40.6], [-105.7, 40.3], [-106.2, 40.4]]]}
+        }
+    ]
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dirs = {name: getattr(trail_assets, name) for name in ['TRAIL_DIR', 'STATE_DIR', 'CACHE_DIR']}
+        for name in self.dirs:
+            setattr(trail_assets, name, os.path.join(self.tmp.name, name.lower()))
+            os.makedirs(getattr(trail_assets, name))
+        trail_assets._trail_assets.clear()
+        trail_assets._state_borders.clear()
+        north = LineString([(40.0, -106.0), (40.5, -106.0), (41.0, -106.0)]).segmentize(0.05)
+        self.write(f'{trail_assets.TRAIL_DIR}/NT.wkt', north.wkt)
+        self.write(f'{trail_assets.TRAIL_DIR}/NT_buffer.wkt', north.buffer(0.7).wkt)
+        points = ''.join(f'<trkpt lat="{lat}" lon="-105.5"></trkpt>' for lat in np.arange(37.0, 38.01, 0.05))
+        self.write(f'{trail_assets.TRAIL_DIR}/south.gpx', f'<?xml version="1.0"?><gpx version="1.1" creator="test" xmlns="http://www.topografix.com/GPX/1/1"><trk><trkseg>{points}</trkseg></trk></gpx>')
+        self.write(f'{trail_assets.STATE_DIR}/colorado.wkt', box(-109.05, 37, -102.05, 41).wkt)
+        self.write(f'{self.tmp.name}/trails.json', json.dumps(self.manifest))
+        self.manifest_path = registry.MANIFEST_PATH
+        registry.MANIFEST_PATH = f'{self.tmp.name}/trails.json' # for the trackers generate_reports builds
+        self.registry = registry.default_registry()
+
+    def tearDown(self) -> None:
+        registry.MANIFEST_PATH = self.manifest_path
+        registry._registry = None
+        for name, directory in self.dirs.items():
+            setattr(trail_assets, name, directory)
+        trail_assets._trail_assets.clear()
+        trail_assets._state_borders.clear()
+        self.tmp.cleanup()
+
+    def write(self, path: str, text: str) -> None:
+        with open(path, 'w') as source_file:
+            source_file.write(text)
+
+    def test_manifest(self) -> None:
+        self.assertEqual(self.registry.codes(), ['NT', 'ST'])
+        self.assertEqual(self.registry['ST'].states, ['Colorado'])
+        self.assertEqual(self.registry.trail_names(), {'NT': 'NT', 'North Trail': 'NT', 'Northern Route': 'NT', 'ST': 'ST', 'South Trail': 'ST'})
+
+    def test_gpx_trail_with_computed_buffer(self) -> None:
+        assets = self.registry['ST'].assets
+        self.assertEqual(len(assets.linestring.coords), 21)
+        self.assertTrue(assets.buffer.contains(assets.linestring))
+        self.assertTrue(assets.buffer.contains(Point(37.5, -106.4))) # ~49 miles west
+        self.assertFalse(assets.buffer.contains(Point(37.5, -106.5))) # ~55 miles west
+        self.assertAlmostEqual(assets.index.miles[-1], 69.1, delta=0.5)
+
+    # a trail without fires nearby is matched from the bounds of its buffer alone, even on a cold cache
+    def test_only_trails_near_fires_are_loaded(self) -> None:
+        feed = FireFeed(self.test_fires)
+        candidates = self.registry.match(feed)
+        self.assertEqual(list(trail_assets._trail_assets.keys()), ['NT'])
+        self.assertEqual(candidates['NT'].tolist(), [0])
+        self.assertEqual(len(candidates['ST']), 0)
+        reports = generate_reports(feed, ['NT', 'ST'])
+        self.assertEqual(list(trail_assets._trail_assets.keys()), ['NT'])
+        self.assertIn('The Ridge Fire crosses the NT', reports['NT'].text)
+        self.assertEqual(reports['ST'].text, empty_report('ST').text)
+        self.assertTrue(np.allclose(np.load(f'{trail_assets.CACHE_DIR}/bounds/ST/bounds.npy'), [36.28, -106.41, 38.72, -104.59], atol=0.01))
+
+    def test_empty_report_matches_tracker(self) -> None:
+        tracker = FireTracker('ST', FireFeed(self.test_fires), registry=self.registry)
+        self.assertTrue(tracker.create_SMS())
+        self.assertEqual(empty_report('ST').text, tracker.text)
+        self.assertEqual(empty_report('ST').mile_index.query(0, 100), tracker.mile_index.query(0, 100))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+import sys
+import os
+import io
+import tempfile
+import numpy as np
+from typing import *
+from PIL import Image
+from shapely.geometry import LineString, Point, box
+
+app_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, app_dir)
+
+import trail_assets
+import render
+
+class RenderUnitTesting(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dirs = {name: getattr(trail_assets, name) for name in ['TRAIL_DIR', 'STATE_DIR', 'CACHE_DIR']}
+        for name in self.dirs:
+            setattr(trail_assets, name, os.path.join(self.tmp.name, name.lower()))
+            os.makedirs(getattr(trail_assets, name))
+        trail_assets._trail_assets.clear()
+        trail_assets._state_borders.clear()
+        trail = LineString([(37.0, -106.0), (38.0, -106.2), (39.0, -105.9)])
+        for path, geometry in [(f'{trail_assets.TRAIL_DIR}/TT.wkt', trail), (f'{trail_assets.TRAIL_DIR}/TT_buffer.wkt', trail.buffer(0.7)), (f'{trail_assets.STATE_DIR}/colorado.wkt', box(-109.05, 37, -102.05, 41))]:
+            with open(path, 'w') as wkt_file:
+                wkt_file.write(geometry.wkt)
+        self.assets = trail_assets.load_trail_assets('TT', ['Colorado'])
+        self.fires = [{'attributes': {'name': 'Test'}, 'shape': Point(38.0, -106.2).buffer(0.3).difference(Point(38.0, -106.2).buffer(0.1))}]
+
+    def tearDown(self) -> None:
+        for name, directory in self.dirs.items():
+            setattr(trail_assets, name, directory)
+        trail_assets._trail_assets.clear()
+        trail_assets._state_borders.clear()
+        self.tmp.cleanup()
+
+    def image(self, fires: List[object], width: int = render.MAP_WIDTH) -> np.ndarray:
+        output = io.BytesIO()
+        render.render_fire_map(self.assets, fires, output, width)
+        return np.asarray(Image.open(io.BytesIO(output.getvalue())).convert('RGB'))
+
+    # pixel of a (lat, lon) point
+    def pixel(self, trail_map: render.TrailMap, lat: float, lon: float) -> Tuple[int, int]:
+        west, east, south, north = trail_map.extent
+        return int((north - lat) / (north - south) * trail_map.size[1]), int((lon - west) / (east - west) * trail_map.size[0])
+
+    def test_fires_over_cached_base(self) -> None:
+        trail_map = render.trail_map(self.assets)
+        self.assertIs(render.trail_map(self.assets), trail_map)
+        empty = self.image([])
+        image = self.image(self.fires)
+        self.assertEqual(image.shape, (trail_map.size[1], trail_map.size[0], 3))
+        self.assertTrue(np.array_equal(empty, trail_map.base[..., :3]))
+        row, column = self.pixel(trail_map, 38.0, -106.42) # inside the burned ring
+        self.assertEqual(tuple(image[row, column]), (255, 0, 0))
+        row, column = self.pixel(trail_map, 38.0, -106.2) # unburned island
+        self.assertNotEqual(tuple(image[row, column]), (255, 0, 0))
+
+    def test_thumbnail_fits_mms(self) -> None:
+        thumbnail = render.render_thumbnail(self.assets, self.fires)
+        self.assertLessEqual(len(thumbnail), render.MMS_MAX_BYTES)
+        self.assertEqual(Image.open(io.BytesIO(thumbnail)).size[0], render.THUMBNAIL_WIDTH)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import unittest
+import sys
+import os
+import time
+import tempfile
+import numpy as np
+from typing import *
+from shapely.geometry import LineString, box
+
+app_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, app_dir)
+
+from fire_feed import FireFeed
+from reports import generate_reports
+from result_cache import ResultCache
+
+class ReportsUnitTesting(unittest.TestCase):
+
+    test_fires = [
+        {
+            'attributes': {'poly_IncidentName': 'Crossing', 'attr_FireDiscoveryDateTime': 1677106499000, 'attr_IncidentSize': 50, 'attr_PercentContained': 95},
+            'geometry': {'rings': [[[-106.3, 38.4], [-105.9, 38.6], [-105.8, 38.3], [-106.3, 38.4]]]}
+        },
+        {
+            'attributes': {'poly_IncidentName': 'Nearby', 'attr_FireDiscoveryDateTime': 1677106499000, 'attr_IncidentSize': 10, 'attr_PercentContained': 0},
+            'geometry': {'rings': [[[-105.6, 39.0], [-105.5, 39.1], [-105.4, 39.0], [-105.6, 39.0]]]}
+        }
+    ]
+
+    # only the CT has trail files, so the PCT report fails
+    def setUp(self) -> None:
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        os.makedirs('trail_wkt_files')
+        os.makedirs('state_wkt_files')
+        trail = LineString([(37.0, -106.0), (38.5, -106.0), (40.0, -106.0)]).segmentize(0.05)
+        with open('trail_wkt_files/CT.wkt', 'w') as wkt_file:
+            wkt_file.write(trail.wkt)
+        with open('trail_wkt_files/CT_buffer.wkt', 'w') as wkt_file:
+            wkt_file.write(trail.buffer(0.7).wkt)
+        for state, bounds in [('colorado', (-109.05, 37, -102.05, 41)), ('new_mexico', (-109.05, 31.33, -103, 37))]:
+            with open(f'state_wkt_files/{state}.wkt', 'w') as wkt_file:
+                wkt_file.write(box(*bounds).wkt)
+
+    def tearDown(self) -> None:
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_serial_reports(self) -> None:
+        reports = generate_reports(FireFeed(self.test_fires), ['CT', 'PCT'])
+        self.assertIn('Total fires within 50 miles of the CT: 2', reports['CT'].text)
+        self.assertIn('The Crossing Fire crosses the CT', reports['CT'].text)
+        self.assertIsNone(reports['PCT'])
+
+    def test_pooled_reports_match_serial(self) -> None:
+        serial = generate_reports(FireFeed(self.test_fires), ['CT', 'PCT'])
+        pooled = generate_reports(FireFeed(self.test_fires), ['CT', 'PCT'], workers=2, timeout=120)
+        self.assertEqual(pooled.keys(), serial.keys())
+        self.assertEqual(pooled['CT'].text, serial['CT'].text)
+        self.assertIsNone(pooled['PCT'])
+
+    def test_mile_window(self) -> None:
+        report = generate_reports(FireFeed(self.test_fires), ['CT'])['CT']
+        self.assertEqual(len(report.mile_index), 2)
+        window = report.window(100, 20)
+        self.assertTrue(window.startswith('1 fire(s) within 20 trail miles of CT mile 100\n'))
+        self.assertIn('The Crossing Fire crosses the CT', window)
+        self.assertNotIn('Nearby', window)
+        self.assertTrue(report.window(0, 10).startswith('0 fire(s)'))
+
+    def test_cached_results(self) -> None:
+        fires = [dict(fire, attributes=dict(fire['attributes'], OBJECTID=i)) for i, fire in enumerate(self.test_fires)]
+        cache = ResultCache(path=os.path.join(self.tmp.name, 'results.sqlite'))
+        first = generate_reports(FireFeed(fires), ['CT'], cache=cache)['CT']
+        self.assertEqual(first.stats['cached_fires'], 0)
+        self.assertEqual(len(cache), 2)
+        second = generate_reports(FireFeed(fires), ['CT'], cache=cache)['CT']
+        self.assertEqual(second.stats['cached_fires'], 2)
+        self.assertEqual(second.text, first.text)
+        moved = [fires[0], dict(fires[1], geometry={'rings': [[[-105.7, 39.0], [-105.6, 39.1], [-105.5, 39.0], [-105.7, 39.0]]]})]
+        self.assertEqual(generate_reports(FireFeed(moved), ['CT'], cache=cache)['CT'].stats['cached_fires'], 1)
+        restarted = generate_reports(FireFeed(fires), ['CT', 'PCT'], workers=2, timeout=120, cache=ResultCache(path=cache.path))['CT']
+        self.assertEqual(restarted.stats['cached_fires'], 2)
+        self.assertEqual(restarted.text, first.text)
+
+    # without a SQLite file, workers read the refresh process's entries and send their new results back
+    def test_pooled_in_memory_cache(self) -> None:
+        fires = [dict(fire, attributes=dict(fire['attributes'], OBJECTID=i)) for i, fire in enumerate(self.test_fires)]
+        cache = ResultCache()
+        first = generate_reports(FireFeed(fires), ['CT', 'PCT'], workers=2, timeout=120, cache=cache)['CT']
+        self.assertEqual(first.stats['cached_fires'], 0)
+        self.assertEqual(len(cache), 2)
+        second = generate_reports(FireFeed(fires), ['CT', 'PCT'], workers=2, timeout=120, cache=cache)['CT']
+        self.assertEqual(second.stats['cached_fires'], 2)
+        self.assertEqual(second.text, first.text)
+
+    def test_pooled_timeout(self) -> None:
+        start = time.monotonic()
+        reports = generate_reports(FireFeed(self.test_fires), ['CT', 'PCT'], workers=2, timeout=0)
+        self.assertEqual(reports, {'CT': None, 'PCT': None})
+        self.assertLess(time.monotonic() - start, 30)
+
+    # one fire with three burn areas across the trail, two of them less than half a mile apart
+    def test_multiple_crossings(self) -> None:
+        square = lambda south, north: [[-106.1, south], [-106.1, north], [-105.9, north], [-105.9, south], [-106.1, south]]
+        fire = {
+            'attributes': {'poly_IncidentName': 'Patchy', 'attr_FireDiscoveryDateTime': 1677106499000, 'attr_IncidentSize': 500, 'attr_PercentContained': 0},
+            'geometry': {'rings': [square(37.5, 37.6), square(39.4, 39.45), square(39.454, 39.5)]}
+        }
+        report = generate_reports(FireFeed([fire]), ['CT'])['CT']
+        self.assertIn('The Patchy Fire crosses the CT at mi. 35 to mi. 41 and mi. 166 to mi. 173\n', report.text)
+        self.assertEqual(len(report.mile_index), 2)
+        self.assertTrue(report.window(100, 70).startswith('1 fire(s)'))
+        self.assertTrue(report.window(100, 20).startswith('0 fire(s)'))
+
+    # a trail out along one long segment and back on a densely sampled leg 0.005 degrees beside it
+    def test_crossing_beside_dense_trail(self) -> None:
+        back = [(lat, -106.005) for lat in np.linspace(40.0, 38.0, 400)]
+        trail = LineString([(37.0, -106.0), (40.0, -106.0)] + back)
+        with open('trail_wkt_files/CT.wkt', 'w') as wkt_file:
+            wkt_file.write(trail.wkt)
+        with open('trail_wkt_files/CT_buffer.wkt', 'w') as wkt_file:
+            wkt_file.write(trail.buffer(0.7).wkt)
+        fire = {
+            'attributes': {'poly_IncidentName': 'Beside', 'attr_FireDiscoveryDateTime': 1677106499000, 'attr_IncidentSize': 50, 'attr_PercentContained': 0},
+            'geometry': {'rings': [[[-106.002, 38.5], [-106.002, 38.6], [-105.99, 38.6], [-105.99, 38.5], [-106.002, 38.5]]]}
+        }
+        report = generate_reports(FireFeed([fire]), ['CT'])['CT']
+        self.assertIn('The Beside Fire crosses the CT at mi. 104 to mi. 111\n', report.text)
+
+if __name__ == '__main__':
+    unittest.main()
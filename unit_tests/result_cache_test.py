@@ -0,0 +1,46 @@
+import unittest
+import sys
+import os
+import time
+import pickle
+import tempfile
+from typing import *
+
+app_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, app_dir)
+
+from result_cache import ResultCache
+
+class ResultCacheUnitTesting(unittest.TestCase):
+
+    def test_least_recently_used_evicted(self) -> None:
+        cache = ResultCache(max_entries=2)
+        cache.put('a', {'states': ['Colorado']})
+        cache.put('b', {'states': ['Utah']})
+        self.assertEqual(cache.get('a'), {'states': ['Colorado']})
+        cache.put('c', {'states': ['Idaho']})
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        self.assertEqual(len(cache), 2)
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+    def test_expired_entries(self) -> None:
+        cache = ResultCache(ttl=0.01)
+        cache.put('a', {'crossing': False})
+        time.sleep(0.02)
+        self.assertIsNone(cache.get('a'))
+
+    def test_sqlite_survives_restart(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.sqlite')
+            cache = ResultCache(path=path)
+            cache.put_many({'a': {'distance': 12.5, 'trail_coord': [38.5, -106.0]}, 'b': {'crossing': True}})
+            restarted = pickle.loads(pickle.dumps(cache)) # as sent to a report worker
+            self.assertEqual(len(restarted), 0)
+            self.assertEqual(restarted.get('a'), {'distance': 12.5, 'trail_coord': [38.5, -106.0]})
+            self.assertIsNone(restarted.get('c'))
+            cache.connection.close()
+            restarted.connection.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import sys
+import os
+from typing import *
+
+app_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, app_dir)
+
+from sms import TrailMatcher, parse_window, render_twiml, segment
+
+class SMSUnitTesting(unittest.TestCase):
+
+    trail_names = {
+        'PCT': 'PCT',
+        'Pacific Crest Trail': 'PCT',
+        'CT': 'CT',
+        'Colorado Trail': 'CT',
+        'CDT': 'CDT'
+    }
+
+    report = 'Total fires within 50 miles of the PCT: 3\n' + ''.join(f'Test Fire {i} Fire (California, 02/22/23) - 50 acres, 95% contained\n' for i in range(3))
+
+    def test_trail_matcher(self) -> None:
+        matcher = TrailMatcher(self.trail_names)
+        self.assertEqual(matcher.match('pct'), 'PCT')
+        self.assertEqual(matcher.match('Update for the colorado trail please'), 'CT')
+        self.assertEqual(matcher.match('CDT 1200'), 'CDT')
+        self.assertEqual(matcher.match('ct.'), 'CT')
+        self.assertIsNone(matcher.match('AT'))
+        self.assertIsNone(matcher.match(''))
+
+    def test_parse_window(self) -> None:
+        self.assertEqual(parse_window('PCT 1200 100'), (1200, 100))
+        self.assertEqual(parse_window('pct mile 1200.5'), (1200.5, 100))
+        self.assertEqual(parse_window('Colorado Trail 20 5'), (20, 5))
+        self.assertIsNone(parse_window('PCT'))
+
+    def test_parse_window_separators_and_units(self) -> None:
+        self.assertEqual(parse_window('PCT 1,200'), (1200, 100))
+        self.assertEqual(parse_window('PCT 1,200.5 miles'), (1200.5, 100))
+        self.assertEqual(parse_window('PCT 1200mi'), (1200, 100))
+        self.assertEqual(parse_window('PCT 1200, 50mi'), (1200, 50))
+        self.assertEqual(parse_window('PCT mile 1200 50 miles.'), (1200, 50))
+        self.assertEqual(parse_window('PCT 1200,50'), (1200, 50))
+        self.assertIsNone(parse_window('PCT 1200km'))
+
+    def test_segments_break_between_lines(self) -> None:
+        segments = segment(self.report, 160)
+        self.assertEqual(len(segments), 2)
+        self.assertTrue(all(len(message) <= 160 for message in segments))
+        self.assertEqual('\n'.join(segments), self.report.rstrip('\n'))
+        self.assertEqual(segment(self.report), [self.report.rstrip('\n')])
+
+    def test_long_line_wrapped(self) -> None:
+        segments = segment('x ' * 200, 160)
+        self.assertTrue(all(0 < len(message) <= 160 for message in segments))
+        self.assertEqual(segment(''), [''])
+
+    def test_render_twiml(self) -> None:
+        twiml = render_twiml(self.report, 160)
+        self.assertEqual(twiml.count('<Message>'), 2)
+        self.assertIn('Total fires within 50 miles of the PCT: 3', twiml)
+
+if __name__ == '__main__':
+    unittest.main()
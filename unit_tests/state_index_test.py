@@ -0,0 +1,45 @@
+import unittest
+import sys
+import os
+from typing import *
+from shapely.geometry import Polygon, box
+
+app_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, app_dir)
+
+from state_index import StateIndex
+
+class StateIndexUnitTesting(unittest.TestCase):
+
+    # borders are (lon, lat) like the state WKT files
+    state_borders = [
+        {'state': 'Utah', 'border': box(-114.05, 37, -109.05, 42)},
+        {'state': 'Colorado', 'border': box(-109.05, 37, -102.05, 41)},
+        {'state': 'Arizona', 'border': box(-114.8, 31.33, -109.05, 37)}
+    ]
+
+    # fires are (lat, lon) like FireFeed shapes
+    def test_single_state(self) -> None:
+        index = StateIndex(self.state_borders)
+        fire = Polygon([(39.0, -106.0), (39.1, -105.9), (39.0, -105.8)])
+        self.assertEqual(index.attribute([fire]), [['Colorado']])
+
+    def test_multi_state_in_border_order(self) -> None:
+        index = StateIndex(self.state_borders)
+        fire = Polygon([(36.9, -110.0), (37.1, -108.0), (37.1, -110.0)])
+        self.assertEqual(index.attribute([fire]), [['Utah', 'Colorado', 'Arizona']])
+
+    def test_straddling_fire_without_vertex_inside(self) -> None:
+        index = StateIndex(self.state_borders)
+        # long sliver from Utah across all of Colorado into Kansas
+        fire = Polygon([(39.0, -110.0), (38.9, -101.0), (39.1, -101.0)])
+        self.assertEqual(index.attribute([fire]), [['Utah', 'Colorado']])
+
+    def test_outside_all_states(self) -> None:
+        index = StateIndex(self.state_borders)
+        fire = Polygon([(50.0, -120.0), (50.1, -119.9), (50.0, -119.8)])
+        self.assertEqual(index.attribute([fire, fire]), [[], []])
+        self.assertEqual(index.attribute([]), [])
+
+if __name__ == '__main__':
+    unittest.main()
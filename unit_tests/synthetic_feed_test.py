@@ -0,0 +1,31 @@
+import unittest
+import sys
+import os
+from typing import *
+from shapely.geometry import Polygon
+
+app_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, app_dir)
+sys.path.insert(0, os.path.join(app_dir, 'benchmarks'))
+
+from synthetic_feed import generate_feed
+from fire_feed import FireFeed
+
+class SyntheticFeedUnitTesting(unittest.TestCase):
+
+    def test_generated_feed(self) -> None:
+        payload = generate_feed(fires=40, vertices=200, large_fraction=0.1, large_vertices=1000, multipolygon_fraction=0.5, seed=1)
+        features = payload['features']
+        self.assertEqual(len(features), 40)
+        self.assertEqual(len({feature['attributes']['OBJECTID'] for feature in features}), 40)
+        self.assertTrue(any(len(feature['geometry']['rings']) == 3 for feature in features))
+        self.assertTrue(any(len(feature['geometry']['rings'][0]) == 1001 for feature in features))
+        for feature in features:
+            self.assertTrue(Polygon(feature['geometry']['rings'][0]).is_valid)
+        self.assertEqual(len(FireFeed(features)), 40)
+
+    def test_seeded(self) -> None:
+        self.assertEqual(generate_feed(fires=5, vertices=50, seed=2), generate_feed(fires=5, vertices=50, seed=2))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+import sys
+import os
+import time
+import tempfile
+import numpy as np
+from typing import *
+from shapely.geometry import LineString, box
+
+app_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, app_dir)
+
+import trail_assets
+
+class TrailAssetsUnitTesting(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dirs = {name: getattr(trail_assets, name) for name in ['TRAIL_DIR', 'STATE_DIR', 'CACHE_DIR']}
+        for name in self.dirs:
+            setattr(trail_assets, name, os.path.join(self.tmp.name, name.lower()))
+            os.makedirs(getattr(trail_assets, name))
+        trail_assets._trail_assets.clear()
+        trail_assets._state_borders.clear()
+        trail = LineString([(37.0, -106.0), (38.0, -106.2), (39.0, -105.9)])
+        self.write(f'{trail_assets.TRAIL_DIR}/TT.wkt', trail.wkt)
+        self.write(f'{trail_assets.TRAIL_DIR}/TT_buffer.wkt', trail.buffer(0.7).wkt)
+        self.write(f'{trail_assets.STATE_DIR}/colorado.wkt', box(-109.05, 37, -102.05, 41).wkt)
+
+    def tearDown(self) -> None:
+        for name, directory in self.dirs.items():
+            setattr(trail_assets, name, directory)
+        trail_assets._trail_assets.clear()
+        trail_assets._state_borders.clear()
+        self.tmp.cleanup()
+
+    def write(self, path: str, text: str) -> None:
+        with open(path, 'w') as wkt_file:
+            wkt_file.write(text)
+
+    def test_assets_kept_in_memory(self) -> None:
+        assets = trail_assets.load_trail_assets('TT', ['Colorado'])
+        self.assertIs(trail_assets.load_trail_assets('TT', ['Colorado']), assets)
+        self.assertEqual(assets.state_borders[0]['state'], 'Colorado')
+        self.assertEqual(len(assets.mile_markers), 2)
+
+    def test_binary_cache_matches_wkt(self) -> None:
+        assets = trail_assets.load_trail_assets('TT', ['Colorado'])
+        self.assertTrue(os.path.exists(f'{trail_assets.CACHE_DIR}/TT/coords.npy'))
+        trail_assets._trail_assets.clear()
+        cached = trail_assets.load_trail_assets('TT', ['Colorado'])
+        self.assertIsNot(cached, assets)
+        self.assertTrue(cached.linestring.equals(assets.linestring))
+        self.assertTrue(cached.buffer.equals(assets.buffer))
+        self.assertTrue(np.array_equal(cached.index.miles, assets.index.miles))
+
+    def test_cache_invalidated_by_source_change(self) -> None:
+        assets = trail_assets.load_trail_assets('TT', ['Colorado'])
+        time.sleep(0.01)
+        self.write(f'{trail_assets.TRAIL_DIR}/TT.wkt', LineString([(37.0, -106.0), (40.0, -106.0)]).wkt)
+        changed = trail_assets.load_trail_assets('TT', ['Colorado'])
+        self.assertIsNot(changed, assets)
+        self.assertEqual(len(changed.index.coords), 2)
+        trail_assets._trail_assets.clear()
+        self.assertEqual(len(trail_assets.load_trail_assets('TT', ['Colorado']).index.coords), 2)
+
+    def test_levels_within_tolerance(self) -> None:
+        assets = trail_assets.load_trail_assets('TT', ['Colorado'])
+        self.assertEqual([level['tolerance'] for level in assets.levels], trail_assets.LOD_TOLERANCES)
+        for level in assets.levels:
+            self.assertLessEqual(level['linestring'].hausdorff_distance(assets.linestring), level['tolerance'])
+            self.assertLessEqual(level['buffer'].hausdorff_distance(assets.buffer), level['tolerance'])
+        self.assertLess(len(assets.levels[0]['buffer'].exterior.coords), len(assets.buffer.exterior.coords))
+        outer, inner = assets.buffer_bounds
+        self.assertTrue(outer.contains(assets.buffer))
+        self.assertTrue(assets.buffer.contains(inner))
+        self.assertFalse(inner.is_empty)
+        self.assertIs(assets.level(0.005), assets.levels[1])
+        self.assertIs(assets.level(0.0001)['linestring'], assets.linestring)
+        trail_assets._trail_assets.clear()
+        cached = trail_assets.load_trail_assets('TT', ['Colorado'])
+        self.assertTrue(cached.levels[0]['buffer'].equals(assets.levels[0]['buffer']))
+        self.assertTrue(cached.buffer_bounds[1].equals(inner))
+
+    # a route for the same path as the track is ignored; separate segments aren't joined
+    def test_read_gpx(self) -> None:
+        points = lambda tag, lats: ''.join(f'<{tag} lat="{lat}" lon="-106.0"></{tag}>' for lat in lats)
+        gpx = lambda body: f'<?xml version="1.0"?><gpx version="1.1" creator="test" xmlns="http://www.topografix.com/GPX/1/1">{body}</gpx>'
+        path = f'{trail_assets.TRAIL_DIR}/TT.gpx'
+        self.write(path, gpx(f'<trk><trkseg>{points("trkpt", [37.0, 37.5, 38.0])}</trkseg></trk><rte>{points("rtept", [37.0, 38.0])}</rte>'))
+        self.assertEqual(list(trail_assets.read_gpx(path).coords), [(37.0, -106.0), (37.5, -106.0), (38.0, -106.0)])
+        self.write(path, gpx(f'<rte>{points("rtept", [37.0, 38.0])}</rte>'))
+        self.assertEqual(len(trail_assets.read_gpx(path).coords), 2)
+        self.write(path, gpx(f'<trk><trkseg>{points("trkpt", [37.0, 37.5])}</trkseg><trkseg>{points("trkpt", [38.0, 38.5])}</trkseg></trk>'))
+        with self.assertRaises(ValueError):
+            trail_assets.read_gpx(path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+import sys
+import os
+import numpy as np
+import shapely
+from typing import *
+from shapely.geometry import Polygon
+
+app_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, app_dir)
+
+from trail_index import TrailIndex, haversine
+
+class TrailIndexUnitTesting(unittest.TestCase):
+
+    # zig-zag trail heading north through Colorado, in (lat, lon) like the trail WKT files
+    trail_coords = np.column_stack((
+        np.linspace(37.0, 40.0, 400),
+        -106.0 + 0.05 * np.sin(np.linspace(0, 20, 400))
+    ))
+
+    def test_cumulative_miles(self) -> None:
+        index = TrailIndex(self.trail_coords)
+        self.assertEqual(index.miles[0], 0)
+        self.assertTrue(np.all(np.diff(index.miles) > 0))
+        straight = haversine(37.0, -106.0, 40.0, -106.0)
+        self.assertGreater(index.miles[-1], straight)
+
+    def test_nearest_vertex_matches_linear_scan(self) -> None:
+        index = TrailIndex(self.trail_coords)
+        rng = np.random.default_rng(1)
+        points = np.column_stack((rng.uniform(36.5, 40.5, 50), rng.uniform(-107, -105, 50)))
+        for point, vertex in zip(points, index.nearest_vertex(points)):
+            d = haversine(point[0], point[1], self.trail_coords[:, 0], self.trail_coords[:, 1])
+            self.assertEqual(vertex, np.argmin(d))
+
+    def test_projected_mile_markers(self) -> None:
+        index = TrailIndex(self.trail_coords)
+        midpoints = (self.trail_coords[:-1] + self.trail_coords[1:]) / 2
+        projected = index.mile_markers(midpoints, project=True)
+        expected = (index.miles[:-1] + index.miles[1:]) / 2
+        self.assertTrue(np.allclose(projected, expected, atol=0.01))
+        snapped = index.mile_markers(midpoints)
+        self.assertTrue(np.all(np.isin(snapped, index.miles)))
+
+    # a long straight segment out and a densely sampled return leg 0.005 degrees beside it
+    def test_projection_where_trail_passes_near_itself(self) -> None:
+        back = np.column_stack((np.linspace(38.0, 37.0, 200), np.full(200, -106.005)))
+        index = TrailIndex(np.vstack(([[37.0, -106.0], [38.0, -106.0]], back)))
+        out = haversine(37.0, -106.0, 37.5, -106.0)
+        self.assertAlmostEqual(index.project([[37.5, -106.0]])[0], out, delta=0.01)
+        self.assertAlmostEqual(index.project([[37.5, -106.0049]])[0], index.miles[2] + 0.5 * (index.miles[-1] - index.miles[2]), delta=0.1)
+        rng = np.random.default_rng(2)
+        points = np.column_stack((rng.uniform(37.0, 38.0, 50), rng.uniform(-106.01, -105.995, 50)))
+        dense = shapely.get_coordinates(shapely.segmentize(shapely.linestrings(index.coords), 0.0005))
+        dense_miles = np.concatenate(([0.0], np.cumsum(haversine(dense[:-1, 0], dense[:-1, 1], dense[1:, 0], dense[1:, 1]))))
+        for point, mile in zip(points, index.project(points)):
+            self.assertAlmostEqual(mile, dense_miles[np.argmin(haversine(point[0], point[1], dense[:, 0], dense[:, 1]))], delta=0.05)
+
+    def test_closest_points_match_dense_scan(self) -> None:
+        index = TrailIndex(self.trail_coords)
+        fires = [
+            Polygon([(38.0, -105.7), (38.3, -105.5), (37.9, -105.4)]),
+            Polygon([(39.5, -106.6), (39.9, -106.3), (39.4, -106.2)]),
+            Polygon([(36.2, -106.1), (36.5, -105.8), (36.1, -105.9)])
+        ]
+        distances, trail_points, fire_points = index.closest_points(fires)
+        trail = shapely.get_coordinates(shapely.segmentize(shapely.linestrings(self.trail_coords), 0.001))
+        for fire, distance, trail_point, fire_point in zip(fires, distances, trail_points, fire_points):
+            perimeter = shapely.get_coordinates(shapely.segmentize(fire.exterior, 0.001))
+            brute = min(haversine(p[0], p[1], trail[:, 0], trail[:, 1]).min() for p in perimeter)
+            self.assertAlmostEqual(distance, brute, delta=0.1)
+            self.assertAlmostEqual(distance, haversine(*trail_point, *fire_point))
+            self.assertLess(fire.exterior.distance(shapely.Point(fire_point)), 1e-6)
+
+    def test_empty_lookup(self) -> None:
+        index = TrailIndex(self.trail_coords)
+        self.assertEqual(len(index.mile_markers([])), 0)
+        self.assertEqual(len(index.mile_markers([], project=True)), 0)
+        self.assertEqual(len(index.closest_points([])[0]), 0)
+
+if __name__ == '__main__':
+    unittest.main()